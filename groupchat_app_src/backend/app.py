@@ -1,10 +1,7 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
 from contextlib import asynccontextmanager
-from datetime import timezone
 import os
 import sys
 
@@ -12,26 +9,25 @@ ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(ROOT)
 
 from routes import register_routes
-from utils.task import generate_daily_summaries
+from migrate import check_schema
+from db import SessionLocal
+from utils.jobs import enqueue_job
+from routes.chat_routes import requeue_pending_moderation
+from utils.task_queue import start_task_workers, stop_task_workers
+from auth import tune_password_hashing
 
-scheduler = AsyncIOScheduler()
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "0") == "1"
 
+# scheduled jobs (daily summaries, message archiving) run in worker.py;
+# the web process only enqueues them
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    
-    scheduler.add_job(
-        generate_daily_summaries, 
-        CronTrigger(hour=0, minute=5, timezone=timezone.utc),
-        id="daily_summary_job",
-        replace_existing=True
-    )
-    
-    scheduler.start()
-    
-    try:
-        yield
-    finally:
-        scheduler.shutdown()
+    await check_schema(auto_migrate=AUTO_MIGRATE)
+    await tune_password_hashing()
+    await requeue_pending_moderation()
+    await start_task_workers()
+    yield
+    await stop_task_workers()
 
 app = FastAPI(title="GroupChat + Therapist System", lifespan=lifespan)
 
@@ -43,12 +39,11 @@ app.add_middleware(
 
 register_routes(app)
 
-from fastapi import BackgroundTasks
-
 @app.post("/test-trigger-summary")
-async def test_trigger_summary(background_tasks: BackgroundTasks):
-    background_tasks.add_task(generate_daily_summaries)
-    return {"ok": True, "message": "任务已在后台启动，请查看控制台日志"}
+async def test_trigger_summary():
+    async with SessionLocal() as session:
+        await enqueue_job(session, "daily_summary")
+    return {"ok": True, "message": "任务已加入队列，由 worker.py 执行，请查看 worker 日志"}
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/", StaticFiles(directory="../frontend", html=True), name="frontend")
\ No newline at end of file
@@ -1,4 +1,8 @@
 import os
+import time
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import jwt, JWTError
@@ -7,10 +11,16 @@ from jose import jwt, JWTError
 # 2. 新增 bcrypt 导入
 import bcrypt
 
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Request
+from fastapi.requests import HTTPConnection
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from pydantic import BaseModel, ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_db, UserProfile, TherapistProfile
+from schemas import Principal
+from utils.cache import TTLCache
 
 load_dotenv()
 
@@ -28,6 +38,63 @@ class TokenData(BaseModel):
     role: str
     user_id: int
 
+# ---------------------------------------------------------
+# PASSWORD HASHING
+# ---------------------------------------------------------
+# bcrypt is ~100-300 ms of CPU per call; routes use the *_async versions,
+# which run it on a small thread pool (bcrypt releases the GIL) so a login
+# burst can't freeze the event loop.
+
+# "auto" picks the smallest cost whose hash takes at least BCRYPT_TARGET_MS here,
+# measured once at startup (tune_password_hashing, from the app lifespan)
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS", "auto")
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+# 12 is bcrypt.gensalt()'s default, which hashes used before tuning; never go below it
+BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS = 12, 16
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# hash/verify calls allowed in flight (running + queued for the pool); beyond
+# that a request waits up to PASSWORD_HASH_WAIT_SECONDS and then gets a 503
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(PASSWORD_HASH_WORKERS * 4)))
+PASSWORD_HASH_WAIT_SECONDS = float(os.getenv("PASSWORD_HASH_WAIT_SECONDS", "5"))
+
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+_rounds: int | None = None
+
+
+def _tune_rounds() -> int:
+    # each extra round doubles the cost; stop at the first one that meets the target
+    for rounds in range(BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS + 1):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"cost-probe", bcrypt.gensalt(rounds))
+        if (time.perf_counter() - start) * 1000 >= BCRYPT_TARGET_MS:
+            return rounds
+    return BCRYPT_MAX_ROUNDS
+
+
+def bcrypt_rounds() -> int:
+    global _rounds
+    if _rounds is None:
+        rounds = int(BCRYPT_ROUNDS) if BCRYPT_ROUNDS != "auto" else _tune_rounds()
+        _rounds = min(max(rounds, BCRYPT_MIN_ROUNDS), BCRYPT_MAX_ROUNDS)
+        print(f"[auth] bcrypt cost {_rounds}")
+    return _rounds
+
+
+async def tune_password_hashing():
+    # before the first request: a probe timed under load would pick too low a cost
+    await asyncio.get_running_loop().run_in_executor(_hash_pool, bcrypt_rounds)
+
+
+def _hash_rounds(password_hash: str) -> int | None:
+    # $2b$<cost>$<salt+hash>
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
 def get_password_hash(password: str) -> str:
     # bcrypt hard limit — must truncate (保留你原有的截断逻辑)
     if len(password.encode("utf-8")) > 72:
@@ -36,7 +103,7 @@ def get_password_hash(password: str) -> str:
     # 4. 改用原生 bcrypt 生成哈希
     # bcrypt 需要 bytes 类型
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(bcrypt_rounds())
     hashed = bcrypt.hashpw(pwd_bytes, salt)
     
     # 存入数据库时转回 string
@@ -60,6 +127,35 @@ def verify_password(plain_password: str, password_hash: str) -> bool:
         return False
 
 
+async def _run_bcrypt(fn, *args):
+    try:
+        await asyncio.wait_for(_hash_slots.acquire(), timeout=PASSWORD_HASH_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server busy, try again")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_bcrypt(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, password_hash: str) -> bool:
+    return await _run_bcrypt(verify_password, plain_password, password_hash)
+
+
+async def needs_rehash(password_hash: str) -> bool:
+    """True when the stored hash uses a lower cost than new hashes get."""
+    rounds = _hash_rounds(password_hash)
+    if rounds is None:
+        return False
+    # the first call may auto-tune the cost, which is itself a few bcrypt runs
+    target = _rounds if _rounds is not None else await _run_bcrypt(bcrypt_rounds)
+    return rounds < target
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=JWT_EXPIRE_MINUTES))
@@ -67,21 +163,91 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=ALGORITHM)
     return encoded_jwt
 
+# ---------------------------------------------------------
+# TOKEN VERIFICATION CACHE
+# ---------------------------------------------------------
+# verified tokens, keyed by sha256 of the token (the raw token is never kept);
+# an entry never outlives the token's own exp
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+_verified_tokens = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+
+def _decode_token(token: str) -> TokenData:
+    key = hashlib.sha256(token.encode()).digest()
+    token_data = _verified_tokens.get(key)
+    if token_data is None:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
+        token_data = TokenData(**payload)
+        _verified_tokens.set(key, token_data, ttl=payload["exp"] - time.time())
+    return token_data
+
+
 def get_current_user_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenData:
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-        token_data = TokenData(**payload)
-        return token_data
-    except JWTError:
+        return _decode_token(token)
+    except (JWTError, ValidationError, KeyError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
 def verify_websocket_token(token: str) -> TokenData | None:
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-        
-        token_data = TokenData(**payload)
-        return token_data
+        return _decode_token(token)
     
     except (JWTError, ValidationError, Exception):
-        return None
\ No newline at end of file
+        return None
+
+
+def caller_user_id(conn: HTTPConnection) -> int | None:
+    """User id behind a request's bearer token or a websocket's ?token=; None if missing or invalid."""
+    auth = conn.headers.get("authorization", "")
+    token = auth[7:] if auth.lower().startswith("bearer ") else conn.query_params.get("token")
+    if not token:
+        return None
+    try:
+        return _decode_token(token).user_id
+    except (JWTError, ValidationError, KeyError):
+        return None
+
+
+# ---------------------------------------------------------
+# PRINCIPAL
+# ---------------------------------------------------------
+# user_id -> profile ids. Only cached once a profile exists: profiles are
+# never deleted, so a cached id can't go stale, and a missing one is re-checked.
+_principals = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+
+async def get_principal(
+    request: Request,
+    token_data: TokenData = Depends(get_current_user_token),
+    session: AsyncSession = Depends(get_db)
+) -> Principal:
+    """
+    The caller (ids, username, role, profile ids) without reloading the User
+    row. Resolved once per request and kept on request.state.principal.
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+
+    profile_ids = _principals.get(token_data.user_id)
+    if profile_ids is None:
+        # both ids in one round trip
+        user_profile_id, therapist_profile_id = (await session.execute(select(
+            select(UserProfile.id).where(UserProfile.user_id == token_data.user_id).scalar_subquery(),
+            select(TherapistProfile.id).where(TherapistProfile.user_id == token_data.user_id).scalar_subquery(),
+        ))).one()
+        profile_ids = (user_profile_id, therapist_profile_id)
+        if user_profile_id or therapist_profile_id:
+            _principals.set(token_data.user_id, profile_ids)
+
+    principal = Principal(
+        username=token_data.username,
+        role=token_data.role,
+        user_id=token_data.user_id,
+        user_profile_id=profile_ids[0],
+        therapist_profile_id=profile_ids[1],
+    )
+    request.state.principal = principal
+    return principal
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Decryption throughput for message history.
+
+Compares a per-row decrypt() loop against decrypt_many, decrypt_many_async
+(offloaded to a thread), decrypt_cached with a warm plaintext cache and the
+AES-GCM envelope format, and checks how long the event loop is blocked in each
+case. Also prints the stored size per row of both formats. No database needed.
+
+Usage (from backend/):
+    python benchmarks/bench_decrypt.py [--rows 1000] [--runs 20]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND)
+
+from cryptography.fernet import Fernet
+os.environ.setdefault("MY_APP_SECRET_KEY", Fernet.generate_key().decode())
+
+from utils.cache import LRUCache
+from utils.security import encrypt, decrypt, decrypt_many, decrypt_many_async, decrypt_cached
+from utils.envelope import seal, open_sealed
+
+
+async def _loop_stall(coro) -> tuple[float, float]:
+    """(wall ms, longest event-loop stall ms) while coro runs."""
+    worst = 0.0
+    done = False
+
+    async def _ticker():
+        nonlocal worst
+        while not done:
+            t = time.perf_counter()
+            await asyncio.sleep(0)
+            worst = max(worst, time.perf_counter() - t)
+
+    ticker = asyncio.create_task(_ticker())
+    await asyncio.sleep(0)  # let the ticker start before the work does
+    start = time.perf_counter()
+    await coro
+    wall = time.perf_counter() - start
+    done = True
+    await ticker
+    return wall * 1000, worst * 1000
+
+
+async def main(rows: int, runs: int):
+    texts = [f"benchmark message {i} " * 4 for i in range(rows)]
+    tokens = [encrypt(t) for t in texts]
+    data_key = os.urandom(32)
+    blobs = [seal(data_key, 1, t) for t in texts]
+    warm = LRUCache(rows)
+    items = [(i, t) for i, t in enumerate(tokens)]
+    await decrypt_cached(items, cache=warm)
+
+    async def per_row():
+        return [decrypt(t) for t in tokens]
+
+    async def batch():
+        return decrypt_many(tokens)
+
+    async def envelope():
+        return [open_sealed(data_key, 1, b) for b in blobs]
+
+    cases = {
+        "per-row loop": per_row,
+        "decrypt_many": batch,
+        "decrypt_many_async": lambda: decrypt_many_async(tokens),
+        "decrypt_cached (warm)": lambda: decrypt_cached(items, cache=warm),
+        "aes-gcm envelope": envelope,
+    }
+
+    plain_bytes = sum(len(t.encode()) for t in texts) / rows
+    print(f"{rows} rows, {runs} runs; bytes/row: plaintext {plain_bytes:.0f}, "
+          f"fernet {sum(len(t) for t in tokens) / rows:.0f}, "
+          f"aes-gcm {sum(len(b) for b in blobs) / rows:.0f}")
+    print(f"{'case':<24} {'p50 ms':>9} {'rows/s':>11} {'max stall ms':>13}")
+    for name, fn in cases.items():
+        walls, stalls = [], []
+        for _ in range(runs):
+            wall, stall = await _loop_stall(fn())
+            walls.append(wall)
+            stalls.append(stall)
+        p50 = statistics.median(walls)
+        print(f"{name:<24} {p50:>9.2f} {rows / (p50 / 1000):>11.0f} {max(stalls):>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.runs))
@@ -0,0 +1,163 @@
+"""
+Versioned schema migrations.
+
+Migrations are the numbered files in sql/migrations/ (NNN_description.sql), applied
+in order and recorded in the schema_migrations table. A migration is never edited
+once shipped; add a new file instead.
+
+Online changes: index builds use ALGORITHM=INPLACE, LOCK=NONE so InnoDB keeps the
+table writable while it builds. The only blocking moment is the short metadata
+lock at start/end, so lock_wait_timeout is kept low: if a long transaction holds
+the table, the statement gives up (re-run later) instead of queueing every chat
+write behind it.
+
+Usage (from backend/):
+    python migrate.py                 apply pending migrations
+    python migrate.py --status        show applied / pending
+    python migrate.py --fake 1        record 001 as applied without running it
+"""
+import os
+import re
+import sys
+import asyncio
+import argparse
+
+from sqlalchemy import text
+from db import engine
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql", "migrations"
+)
+MIGRATE_LOCK_WAIT_TIMEOUT = int(os.getenv("MIGRATE_LOCK_WAIT_TIMEOUT", "5"))
+# named lock so several workers starting with AUTO_MIGRATE don't race each other
+LOCK_NAME = "groupchat_schema_migrations"
+
+CREATE_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+_FILENAME = re.compile(r"^(\d+)_(.+)\.sql$")
+
+
+def available_migrations() -> list[tuple[int, str, str]]:
+    """(version, name, path) for every file in sql/migrations/, oldest first."""
+    out = []
+    for fname in os.listdir(MIGRATIONS_DIR):
+        m = _FILENAME.match(fname)
+        if m:
+            out.append((int(m.group(1)), m.group(2), os.path.join(MIGRATIONS_DIR, fname)))
+    out.sort()
+    versions = [v for v, _, _ in out]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration version in {MIGRATIONS_DIR}")
+    return out
+
+
+def split_statements(sql: str) -> list[str]:
+    """Split a migration file on ';' at end of line. Full-line -- comments are dropped."""
+    lines = [ln for ln in sql.splitlines() if not ln.lstrip().startswith("--")]
+    stmts = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+    return [s.strip() for s in stmts if s.strip()]
+
+
+async def applied_versions(conn) -> set[int]:
+    await conn.exec_driver_sql(CREATE_VERSION_TABLE)
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return {row[0] for row in result}
+
+
+async def pending_migrations(conn) -> list[tuple[int, str, str]]:
+    done = await applied_versions(conn)
+    return [m for m in available_migrations() if m[0] not in done]
+
+
+async def _record(conn, version: int, name: str):
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+        {"v": version, "n": name},
+    )
+
+
+async def upgrade(fake: int | None = None, db_engine=None) -> int:
+    """Apply every pending migration (to db_engine, default the app's). Returns how many were applied."""
+    async with (db_engine or engine).connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        got = (await conn.execute(text("SELECT GET_LOCK(:n, 60)"), {"n": LOCK_NAME})).scalar()
+        if got != 1:
+            raise RuntimeError("Another process is running migrations")
+        try:
+            await conn.exec_driver_sql(f"SET SESSION lock_wait_timeout = {MIGRATE_LOCK_WAIT_TIMEOUT}")
+            pending = await pending_migrations(conn)
+
+            if fake is not None:
+                match = [m for m in pending if m[0] == fake]
+                if not match:
+                    raise RuntimeError(f"Migration {fake} is not pending")
+                await _record(conn, fake, match[0][1])
+                print(f"[migrate] recorded {fake:03d}_{match[0][1]} as applied (not run)")
+                return 0
+
+            for version, name, path in pending:
+                print(f"[migrate] applying {version:03d}_{name}")
+                with open(path, encoding="utf-8") as f:
+                    statements = split_statements(f.read())
+                # MySQL DDL commits implicitly, so a failed file is not rolled back;
+                # keep each migration small and re-runnable
+                for stmt in statements:
+                    await conn.exec_driver_sql(stmt)
+                await _record(conn, version, name)
+            return len(pending)
+        finally:
+            await conn.execute(text("SELECT RELEASE_LOCK(:n)"), {"n": LOCK_NAME})
+
+
+async def check_schema(auto_migrate: bool = False):
+    """
+    Called at startup. Refuses to start on an out-of-date schema (the routes
+    would fail on missing columns/tables anyway), unless auto_migrate is set.
+    """
+    async with engine.connect() as conn:
+        pending = await pending_migrations(conn)
+        await conn.commit()
+
+    if pending and auto_migrate:
+        await upgrade()
+        return
+    if pending:
+        names = ", ".join(f"{v:03d}_{n}" for v, n, _ in pending)
+        raise RuntimeError(
+            f"Database schema is behind ({names} pending). "
+            f"Run `python migrate.py` or start with AUTO_MIGRATE=1."
+        )
+    print(f"[migrate] schema up to date (version {available_migrations()[-1][0]:03d})")
+
+
+async def status():
+    async with engine.connect() as conn:
+        done = await applied_versions(conn)
+        await conn.commit()
+    for version, name, _ in available_migrations():
+        print(f"  [{'x' if version in done else ' '}] {version:03d}_{name}")
+
+
+async def main(args):
+    try:
+        if args.status:
+            await status()
+        else:
+            n = await upgrade(fake=args.fake)
+            print(f"[migrate] {n} migration(s) applied")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--fake", type=int, metavar="VERSION",
+                        help="mark a pending migration as applied without running it")
+    sys.exit(asyncio.run(main(parser.parse_args())))
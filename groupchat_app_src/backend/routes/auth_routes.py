@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from db import User, UserRole, get_db
 from schemas import AuthPayload, ChangePasswordPayload, TokenData
-from auth import get_password_hash, verify_password, create_access_token, get_current_user_token
+from auth import (
+    get_password_hash_async, verify_password_async, needs_rehash,
+    create_access_token, get_current_user_token
+)
+from utils.ratelimit import enforce, client_ip
 import os
 
 router = APIRouter(prefix="/api", tags=["Auth"])
@@ -13,13 +17,15 @@ AVATAR_DIR = "static/avatars"
 @router.post("/signup")
 async def signup(
     payload: AuthPayload,
+    request: Request,
     session: AsyncSession = Depends(get_db)
 ):
+    await enforce(("signup_ip", client_ip(request)))
     exists = await session.execute(select(User).where(User.username == payload.username))
     if exists.scalar_one_or_none():
         raise HTTPException(400, "Username already taken")
 
-    u = User(username=payload.username, password_hash=get_password_hash(payload.password), user_role=UserRole.user)
+    u = User(username=payload.username, password_hash=await get_password_hash_async(payload.password), user_role=UserRole.user)
     session.add(u)
     await session.commit()
     await session.refresh(u)
@@ -40,7 +46,7 @@ async def signup_therapist(
     if exists.scalar_one_or_none():
         raise HTTPException(400, "Username already taken")
 
-    u = User(username=payload.username, password_hash=get_password_hash(payload.password), user_role=UserRole.therapist)
+    u = User(username=payload.username, password_hash=await get_password_hash_async(payload.password), user_role=UserRole.therapist)
     session.add(u)
     await session.commit()
     await session.refresh(u)
@@ -51,14 +57,16 @@ async def signup_therapist(
 @router.post("/operator/signup")
 async def signup_operator(
     payload: AuthPayload,
+    request: Request,
     session: AsyncSession = Depends(get_db)
 ):
+    await enforce(("operator_signup_ip", client_ip(request)))
     
     exists = await session.execute(select(User).where(User.username == payload.username))
     if exists.scalar_one_or_none():
         raise HTTPException(400, "Username already taken")
 
-    u = User(username=payload.username, password_hash=get_password_hash(payload.password), user_role=UserRole.operator)
+    u = User(username=payload.username, password_hash=await get_password_hash_async(payload.password), user_role=UserRole.operator)
     session.add(u)
     await session.commit()
     await session.refresh(u)
@@ -69,14 +77,25 @@ async def signup_operator(
 @router.post("/login")
 async def login(
     payload: AuthPayload,
+    request: Request,
     session: AsyncSession = Depends(get_db)
 ):
     print(">>> LOGIN ENTERED")  
+    # before any DB or bcrypt work
+    await enforce(
+        ("login_ip", client_ip(request)),
+        ("login_user", payload.username.strip().lower()),
+    )
     res = await session.execute(select(User).where(User.username == payload.username))
     u = res.scalar_one_or_none()
-    if not u or not verify_password(payload.password, u.password_hash):
+    if not u or not await verify_password_async(payload.password, u.password_hash):
         raise HTTPException(401, "Invalid credentials")
 
+    # upgrade hashes made with an older, cheaper cost while we have the password
+    if await needs_rehash(u.password_hash):
+        u.password_hash = await get_password_hash_async(payload.password)
+        await session.commit()
+
     token = create_access_token({"username": u.username, "role": u.user_role.value, "user_id": u.id})
     return {"ok": True, "token": token}
 
@@ -102,10 +121,10 @@ async def change_password(
     session: AsyncSession = Depends(get_db)
 ):
     user = (await session.execute(select(User).where(User.username == token_data.username))).scalar_one_or_none()
-    if not verify_password(payload.old_password, user.password_hash):
+    if not await verify_password_async(payload.old_password, user.password_hash):
         raise HTTPException(400, "Incorrect current password")
     
-    user.password_hash = get_password_hash(payload.new_password)
+    user.password_hash = await get_password_hash_async(payload.new_password)
     session.add(user)
     await session.commit()
     return {"ok": True}
\ No newline at end of file
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
-from db import MailboxMessage, User, get_db, UserRole, UserTherapist,UserProfile,TherapistProfile
+from db import MailboxMessage, User, get_db, get_read_db, UserRole, UserTherapist,UserProfile,TherapistProfile
 from auth import get_current_user_token
 from schemas import (
     TokenData, MailboxListResponse, MailSendPayload, 
@@ -9,6 +9,8 @@ from schemas import (
     MailSendSuccessResponse, 
 )
 from datetime import datetime
+from websocket_manager import manager, MAILBOX_TOPIC
+from utils.ws_events import MailboxKind, mailbox_event
 from sqlalchemy.orm import aliased
 import json
 
@@ -73,7 +75,7 @@ async def _fetch_and_format_mails(session: AsyncSession, is_sent_box: bool, user
 @router.get("", response_model=MailboxListResponse)
 async def get_mailbox(
     token_data: TokenData = Depends(get_current_user_token),
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_read_db)
 ):
     out = await _fetch_and_format_mails(session, False, token_data.user_id)
     return {"messages": out}
@@ -82,7 +84,7 @@ async def get_mailbox(
 @router.get("/sent", response_model=MailboxListResponse)
 async def get_sent_mailbox(
     token_data: TokenData = Depends(get_current_user_token), 
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_read_db)
 ):
     out = await _fetch_and_format_mails(session, True, token_data.user_id)
     return {"messages": out}
@@ -132,6 +134,9 @@ async def send_notification(
     await session.commit()
     await session.refresh(mail)
 
+    await manager.send_to_user(
+        target_id, mailbox_event(mail.id, MailboxKind.direct_message), MAILBOX_TOPIC
+    )
     return {"ok": True, "mail_id": mail.id}
 
 
@@ -171,6 +176,10 @@ async def approve_user(
     )
     session.add(notice)
     await session.commit()
+
+    await manager.send_to_user(
+        user.id, mailbox_event(notice.id, MailboxKind.approval), MAILBOX_TOPIC
+    )
     return {"ok": True}
 
 @router.get("/partner")
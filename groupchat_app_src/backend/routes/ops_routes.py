@@ -0,0 +1,108 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, text
+from db import UserRole, BotIntentLog, get_db, pool_metrics
+from auth import get_current_user_token
+from schemas import TokenData
+from utils.jobs import JOB_NAMES, enqueue_job, recent_runs
+from utils.task_queue import task_queue_metrics
+
+router = APIRouter(prefix="/api/ops", tags=["Ops"])
+
+
+def _require_operator(token_data: TokenData):
+    if token_data.role != UserRole.operator:
+        raise HTTPException(403, "Only operator can manage jobs")
+
+
+@router.post("/jobs/{job_name}")
+async def trigger_job(
+    job_name: str,
+    token_data: TokenData = Depends(get_current_user_token),
+    session: AsyncSession = Depends(get_db)
+):
+    """Queue a run for worker.py; nothing runs in the web process."""
+    _require_operator(token_data)
+    if job_name not in JOB_NAMES:
+        raise HTTPException(404, "Unknown job")
+
+    await enqueue_job(session, job_name, requested_by=token_data.user_id)
+    return {"ok": True, "queued": job_name}
+
+
+@router.get("/jobs")
+async def list_job_runs(
+    job_name: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    token_data: TokenData = Depends(get_current_user_token),
+    session: AsyncSession = Depends(get_db)
+):
+    """Recent runs with their telemetry (duration, groups processed, LLM tokens)."""
+    _require_operator(token_data)
+
+    runs = await recent_runs(session, job_name, limit)
+    return {
+        "runs": [
+            {
+                "id": r.id,
+                "job_name": r.job_name,
+                "run_key": r.run_key,
+                "status": r.status.value,
+                "owner": r.owner,
+                "queued_at": str(r.queued_at) if r.queued_at else None,
+                "started_at": str(r.started_at) if r.started_at else None,
+                "finished_at": str(r.finished_at) if r.finished_at else None,
+                "duration_ms": r.duration_ms,
+                "groups_processed": r.groups_processed,
+                "llm_calls": r.llm_calls,
+                "prompt_tokens": r.prompt_tokens,
+                "completion_tokens": r.completion_tokens,
+                "stats": r.stats,
+                "error": r.error,
+            }
+            for r in runs
+        ]
+    }
+
+
+@router.get("/db-pool")
+async def db_pool_status(token_data: TokenData = Depends(get_current_user_token)):
+    """Connection pool usage and checkout-wait stats for this process."""
+    _require_operator(token_data)
+    return {"pools": pool_metrics()}
+
+
+@router.get("/tasks")
+async def task_queue_status(token_data: TokenData = Depends(get_current_user_token)):
+    """Background task counts by status, and how long the oldest ready task has waited."""
+    _require_operator(token_data)
+    return await task_queue_metrics()
+
+
+@router.get("/bot-intent")
+async def bot_intent_summary(
+    hours: int = Query(24, ge=1, le=24 * 30),
+    token_data: TokenData = Depends(get_current_user_token),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Bot-reply gate decisions over the last `hours`, by label. Sample
+    bot_intent_logs rows by message_id to judge precision.
+    """
+    _require_operator(token_data)
+    rows = (await session.execute(
+        select(
+            BotIntentLog.label, BotIntentLog.answered, func.count(),
+            func.avg(BotIntentLog.latency_ms), func.max(BotIntentLog.latency_ms)
+        )
+        .where(BotIntentLog.created_at >= func.date_sub(func.now(), text(f"INTERVAL {hours} HOUR")))
+        .group_by(BotIntentLog.label, BotIntentLog.answered)
+    )).all()
+    return {
+        "hours": hours,
+        "decisions": [
+            {"label": label, "answered": answered, "count": n,
+             "avg_latency_ms": round(avg or 0, 2), "max_latency_ms": mx}
+            for label, answered, n, avg, mx in rows
+        ]
+    }
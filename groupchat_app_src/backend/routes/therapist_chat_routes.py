@@ -3,7 +3,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from db import get_db, UserTherapist, UserTherapistChat, User, UserRole
 from auth import get_current_user_token
-from utils.security import encrypt, decrypt
+from utils.security import encrypt, decrypt_cached, message_plaintext_cache
+from websocket_manager import manager, THERAPIST_CHAT_TOPIC
+from utils.ws_events import THERAPIST_CHAT_EVENT
 from schemas import (
     TokenData, ChatSendPayload, MarkReadPayload, ChatMessageListResponse
 )
@@ -46,6 +48,13 @@ async def send_user_therapist_message(
     session.add(chat)
     await session.commit()
     await session.refresh(chat)
+    message_plaintext_cache.set(("therapist_chat", chat.id), payload.message)
+
+    await manager.send_to_user(
+        target_id,
+        {"type": THERAPIST_CHAT_EVENT, "chat_id": chat.id, "sender_id": sender_id},
+        THERAPIST_CHAT_TOPIC
+    )
     return {"ok": True, "chat_id": chat.id}
 
 
@@ -91,16 +100,17 @@ async def list_messages(
         .order_by(UserTherapistChat.created_at)
     )
     messages = (await session.execute(stmt)).scalars().all()
+    plains = await decrypt_cached([(("therapist_chat", m.id), m.message) for m in messages])
 
     out = [
         {
             "id": m.id,
             "sender_id": m.sender_id,
-            "message": decrypt(m.message),
+            "message": plain,
             "is_read": m.is_read,
             "created_at": m.created_at
         }
-        for m in messages
+        for m, plain in zip(messages, plains)
     ]
 
     return {"messages": out}
@@ -2,12 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 from datetime import date, datetime, time
-from utils.security import encrypt, decrypt
+from utils.security import encrypt, decrypt_many_async
 from db import (
     User, TherapistProfile, UserRole, UserTherapist, UserProfile, 
-    UserTherapistChat, DailyUserSummary, ChatGroups, ChatGroupUsers, get_db
+    UserTherapistChat, DailyUserSummary, ChatGroups, ChatGroupUsers, get_db, get_read_db
 )
-from auth import get_current_user_token
+from auth import get_current_user_token, get_principal
 from schemas import (
     TokenData, TherapistPublicDetail, TherapistPrivateDetail, TherapistListResponse,
     TherapistProfileCreate, TherapistProfileUpdate, DailySummaryListResponse, 
@@ -36,7 +36,7 @@ async def has_therapist_profile(
 @router.get("/therapists", response_model=TherapistListResponse)
 async def list_therapists(
     token_data: TokenData = Depends(get_current_user_token),
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_read_db)
 ):
     stmt = (
         select(User, TherapistProfile)
@@ -63,7 +63,7 @@ async def list_therapists(
 @router.post("/profile", response_model=TherapistProfileWrappedResponse)
 async def create_therapist_profile(
     payload: TherapistProfileCreate,
-    token_data: TokenData = Depends(get_current_user_token),
+    token_data: TokenData = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     if token_data.role != UserRole.therapist:
@@ -88,11 +88,10 @@ async def create_therapist_profile(
     session.add(profile)
     await session.commit()
     await session.refresh(profile)
-    user = await session.get(User, token_data.user_id)
 
     profile = {
-        "user_id": user.id,
-        "username": user.username,
+        "user_id": token_data.user_id,
+        "username": token_data.username,
         "avatar_url": profile.avatar_url,
         "prefer_name": profile.prefer_name,
         "bio": profile.bio,
@@ -106,15 +105,15 @@ async def create_therapist_profile(
 @router.post("/profile/update", response_model=TherapistProfileWrappedResponse)
 async def update_therapist_profile(
     payload: TherapistProfileUpdate,
-    token_data: TokenData = Depends(get_current_user_token),
+    token_data: TokenData = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     if token_data.role != UserRole.therapist:
         raise HTTPException(403)
 
-    profile = (await session.execute(
-        select(TherapistProfile).where(TherapistProfile.user_id == token_data.user_id)
-    )).scalar_one_or_none()
+    profile = None
+    if token_data.therapist_profile_id:
+        profile = await session.get(TherapistProfile, token_data.therapist_profile_id)
 
     if not profile:
         raise HTTPException(404)
@@ -127,11 +126,10 @@ async def update_therapist_profile(
     await session.commit()
     await session.refresh(profile)
 
-    user = await session.get(User, token_data.user_id)
 
     profile = {
-        "user_id": user.id,
-        "username": user.username,
+        "user_id": token_data.user_id,
+        "username": token_data.username,
         "avatar_url": profile.avatar_url,
         "prefer_name": profile.prefer_name,
         "bio": profile.bio,
@@ -144,7 +142,7 @@ async def update_therapist_profile(
 
 @router.get("/profile/me", response_model=TherapistPrivateDetail)
 async def get_my_therapist_profile(
-    token_data:TokenData = Depends(get_current_user_token), 
+    token_data:TokenData = Depends(get_principal), 
     session: AsyncSession = Depends(get_db)
 ):
     if token_data.role != UserRole.therapist:
@@ -167,11 +165,10 @@ async def get_my_therapist_profile(
         await session.commit()
         await session.refresh(profile)
 
-    user = await session.get(User, token_data.user_id)
 
     return {
-        "user_id": user.id,
-        "username": user.username,
+        "user_id": token_data.user_id,
+        "username": token_data.username,
         "avatar_url": profile.avatar_url,
         "prefer_name": profile.prefer_name,
         "bio": profile.bio,
@@ -300,7 +297,7 @@ async def get_user_summaries(
     start_date: date = Query(...),
     end_date: date = Query(...),
     token_data: TokenData = Depends(get_current_user_token),
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_read_db)
 ):
     if token_data.role != UserRole.therapist:
         raise HTTPException(403)
@@ -334,26 +331,20 @@ async def get_user_summaries(
     if not summaries:
         return DailySummaryListResponse(summaries=[])
     
+    texts = await decrypt_many_async([s.summary_text or "" for s in summaries], strict=False)
+    moods = await decrypt_many_async([s.mood or "" for s in summaries], strict=False)
+
     results = []
-    for item in summaries:
-        text = None
-        if item.summary_text:
-            try:
-                text = decrypt(item.summary_text)
-            except Exception:
-                text = "[Decryption Error]"
-
-        mood = None
-        if item.mood:
-            try:
-                mood = decrypt(item.mood)
-            except Exception:
-                mood = None
+    for item, text, mood in zip(summaries, texts, moods):
+        if not item.summary_text:
+            text = None
+        elif text is None:
+            text = "[Decryption Error]"
 
         results.append({
             "summary_date": item.summary_date,
             "summary_text": text,
-            "mood": mood
+            "mood": mood if item.mood else None
         })
     
     return DailySummaryListResponse(summaries=results)
\ No newline at end of file
@@ -8,6 +8,11 @@ class TokenData(BaseModel):
     role: str
     user_id: int
 
+class Principal(TokenData):
+    # the caller's profile row ids, if they have one (see auth.get_principal)
+    user_profile_id: Optional[int] = None
+    therapist_profile_id: Optional[int] = None
+
 class AuthPayload(BaseModel):
     username: str
     password: str
@@ -152,10 +157,13 @@ class ChatMessageListResponse(BaseModel):
 class MessagePayload(BaseModel):
     content: str
     group_id: int
+    client_msg_id: Optional[str] = None
 
 class MessageResponse(BaseModel):
     ok: bool
     id: int
+    # MODERATION_MODE=async: stored, verdict follows over the websocket
+    pending: bool = False
     ai_opening_line: Optional[str] = None
     detail: Optional[str] = None
     rationale: Optional[str] = None
@@ -166,7 +174,11 @@ class SupportChatRequest(BaseModel):
 
 class GroupMessageResponse(BaseModel):
     id: int
+    seq: Optional[int] = None
+    user_id: Optional[int] = None
     username: str
+    prefer_name: Optional[str] = None
+    avatar_url: Optional[str] = None
     content: str
     is_visible: bool
     is_bot: bool
@@ -177,6 +189,9 @@ class GroupMessageResponse(BaseModel):
 
 class GroupMessageListResponse(BaseModel):
     messages: List[GroupMessageResponse]
+    next_cursor: Optional[int] = None
+    # group's publish seq when the page was read: the websocket resume cursor
+    last_seq: int = 0
 
 class GroupMembersListResponse(BaseModel):
     ok: bool = True
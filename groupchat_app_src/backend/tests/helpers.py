@@ -0,0 +1,15 @@
+import uuid
+
+
+async def make_group(session, n_members: int) -> tuple[int, list[int]]:
+    """An active group with n_members fresh users; returns (group_id, user_ids)."""
+    from db import User, ChatGroups, ChatGroupUsers
+
+    tag = uuid.uuid4().hex[:8]
+    users = [User(username=f"t{tag}_{i}", password_hash="x") for i in range(n_members)]
+    group = ChatGroups(group_name=f"test {tag}", is_active=True, current_size=n_members)
+    session.add_all(users + [group])
+    await session.flush()
+    session.add_all(ChatGroupUsers(group_id=group.id, user_id=u.id, is_active=True) for u in users)
+    await session.commit()
+    return group.id, [u.id for u in users]
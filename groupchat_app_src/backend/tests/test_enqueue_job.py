@@ -0,0 +1,43 @@
+import uuid
+
+
+def test_failed_run_can_be_queued_again(db):
+    from sqlalchemy import select, update
+    from db import SessionLocal, JobRun, JobStatus
+    from utils.jobs import enqueue_job
+
+    run_key = f"test:{uuid.uuid4().hex}"
+
+    async def status():
+        async with SessionLocal() as session:
+            return (await session.execute(
+                select(JobRun.status).where(JobRun.job_name == "daily_summary", JobRun.run_key == run_key)
+            )).scalar_one()
+
+    async def set_status(value):
+        async with SessionLocal() as session:
+            await session.execute(
+                update(JobRun).where(JobRun.job_name == "daily_summary", JobRun.run_key == run_key)
+                .values(status=value, error="boom" if value == JobStatus.failed else None)
+            )
+            await session.commit()
+
+    async def body():
+        async with SessionLocal() as session:
+            assert await enqueue_job(session, "daily_summary", run_key=run_key)
+            # queued or running: collapses into the existing row
+            assert not await enqueue_job(session, "daily_summary", run_key=run_key)
+        await set_status(JobStatus.running)
+        async with SessionLocal() as session:
+            assert not await enqueue_job(session, "daily_summary", run_key=run_key)
+
+        await set_status(JobStatus.failed)
+        async with SessionLocal() as session:
+            assert await enqueue_job(session, "daily_summary", run_key=run_key)
+        assert await status() == JobStatus.queued
+
+        await set_status(JobStatus.succeeded)
+        async with SessionLocal() as session:
+            assert not await enqueue_job(session, "daily_summary", run_key=run_key)
+
+    db(body)
@@ -0,0 +1,57 @@
+from helpers import make_group
+
+
+def test_core_update_marks_the_caller(db):
+    from sqlalchemy import select, update
+    from db import SessionLocal, ChatGroups, set_session_caller, recently_wrote
+
+    async def body():
+        async with SessionLocal() as session:
+            group_id, (user_id,) = await make_group(session, 1)
+
+        async with SessionLocal() as session:
+            set_session_caller(session, user_id)
+            await session.execute(select(ChatGroups.id).where(ChatGroups.id == group_id))
+            await session.commit()
+            assert not recently_wrote(user_id)
+
+            # a Core statement: no flush happens
+            await session.execute(update(ChatGroups).where(ChatGroups.id == group_id).values(max_size=12))
+            await session.commit()
+            assert recently_wrote(user_id)
+
+    db(body)
+
+
+def test_websocket_post_marks_the_caller(db, monkeypatch):
+    from db import SessionLocal, recently_wrote
+    from schemas import TokenData
+    from websocket_manager import ClientConnection
+    from routes import chat_routes
+
+    # stored as pending: no LLM judge in the request path
+    monkeypatch.setattr(chat_routes, "MODERATION_MODE", "async")
+
+    class FakeSocket:
+        def __init__(self):
+            self.sent = []
+
+        async def send_json(self, frame):
+            self.sent.append(frame)
+
+    async def body():
+        async with SessionLocal() as session:
+            group_id, (user_id,) = await make_group(session, 1)
+
+        ws = FakeSocket()
+        token_data = TokenData(username="member", role="user", user_id=user_id)
+        state = chat_routes.WSClientState(token_data, ClientConnection(ws, user_id))
+        # a socket's session has no Authorization header to go by
+        async with SessionLocal() as session:
+            await chat_routes.ws_send_message(ws, session, state, {
+                "group_id": group_id, "content": "hi over the socket", "client_msg_id": "c1"
+            })
+        assert ws.sent[-1]["type"] == "ack"
+        assert recently_wrote(user_id)
+
+    db(body)
@@ -0,0 +1,47 @@
+import uuid
+
+from helpers import make_group
+
+
+def test_message_posted_during_summary_is_folded_next_time(db, monkeypatch):
+    from db import SessionLocal, BackgroundSessionLocal, Message
+    from schemas import MessagePayload, TokenData
+    from utils.envelope import seal_message
+    from routes import chat_routes
+
+    late_text = f"posted while summarizing {uuid.uuid4().hex}"
+    calls = []
+    state = {}
+
+    class FakeChatbot:
+        async def summarize_chat(self, records, previous_summary=None):
+            calls.append([r["message"] for r in records])
+            if len(calls) == 1:
+                # another member posts while the LLM is still working
+                group_id = state["group_id"]
+                async with BackgroundSessionLocal() as other:
+                    late = Message(user_id=state["other_user"], group_id=group_id, is_visible=True,
+                                   **await seal_message(group_id, late_text))
+                    other.add(late)
+                    await other.commit()
+                    await chat_routes.broadcast_message(other, late, group_id)
+            return f"summary {len(calls)}"
+
+    monkeypatch.setattr(chat_routes, "get_chatbot", lambda: FakeChatbot())
+
+    async def body():
+        async with SessionLocal() as session:
+            group_id, user_ids = await make_group(session, 2)
+        state.update(group_id=group_id, other_user=user_ids[1])
+        caller = TokenData(username="member", role="user", user_id=user_ids[0])
+        async with SessionLocal() as session:
+            for content in ("hello everyone", "what did I miss?"):
+                await chat_routes.summarize_chat(
+                    MessagePayload(content=content, group_id=group_id), token_data=caller, session=session
+                )
+
+    db(body)
+
+    assert len(calls) == 2
+    assert late_text not in calls[0]
+    assert late_text in calls[1]
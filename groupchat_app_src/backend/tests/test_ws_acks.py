@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from websocket_manager import ClientConnection, UserConnectionManager, group_topic
+
+USER = 3
+
+
+def _manager_with(conn: ClientConnection) -> UserConnectionManager:
+    m = UserConnectionManager()
+    m.active_users[conn.user_id] = [conn]
+    return m
+
+
+def test_acks_only_kept_for_subscribed_groups():
+    conn = ClientConnection(websocket=None, user_id=USER)
+    conn.subscribe([group_topic(1)])
+    m = _manager_with(conn)
+
+    m.record_ack(conn, 1, 5)
+    m.record_ack(conn, 2, 9)     # not subscribed: ignored
+    m.record_ack(conn, 1, 4)     # older than the cursor: ignored
+    assert m.last_acked.get((USER, 1)) == 5
+    assert (USER, 2) not in m.last_acked
+
+    conn.unsubscribe([group_topic(1)])
+    m.forget_acks(USER, [1])
+    assert len(m.last_acked) == 0
+
+
+def test_cursor_kept_while_another_socket_subscribes():
+    tab1 = ClientConnection(websocket=None, user_id=USER)
+    tab2 = ClientConnection(websocket=None, user_id=USER)
+    for c in (tab1, tab2):
+        c.subscribe([group_topic(1)])
+    m = _manager_with(tab1)
+    m.active_users[USER].append(tab2)
+
+    m.record_ack(tab1, 1, 5)
+    tab1.unsubscribe([group_topic(1)])
+    m.forget_acks(USER, [1])
+    assert m.last_acked.get((USER, 1)) == 5
+
+    # removed from the group: every socket drops it
+    m.drop_groups(USER, [1])
+    assert not tab2.wants(group_topic(1))
+    assert (USER, 1) not in m.last_acked
@@ -0,0 +1,33 @@
+import os
+import re
+
+from utils.ws_events import (
+    MAILBOX_TOPIC, THERAPIST_CHAT_TOPIC, MAILBOX_EVENT, THERAPIST_CHAT_EVENT, MailboxKind, mailbox_event
+)
+
+EVENTS_JS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "frontend", "groupchat-react-app", "src", "ws", "events.js",
+)
+
+
+def _frontend_constants() -> dict:
+    with open(EVENTS_JS, encoding="utf-8") as f:
+        src = f.read()
+    consts = dict(re.findall(r'export const (\w+) = "([^"]*)";', src))
+    body = re.search(r"export const MailboxKind = \{(.*?)\};", src, re.S).group(1)
+    consts["MailboxKind"] = dict(re.findall(r'(\w+): "([^"]*)"', body))
+    return consts
+
+
+def test_frontend_matches_backend_event_names():
+    js = _frontend_constants()
+    assert js["MAILBOX_TOPIC"] == MAILBOX_TOPIC
+    assert js["THERAPIST_CHAT_TOPIC"] == THERAPIST_CHAT_TOPIC
+    assert js["MAILBOX_EVENT"] == MAILBOX_EVENT
+    assert js["THERAPIST_CHAT_EVENT"] == THERAPIST_CHAT_EVENT
+    assert js["MailboxKind"] == {k.name: k.value for k in MailboxKind}
+
+
+def test_mailbox_event_frame():
+    assert mailbox_event(5, MailboxKind.approval) == {"type": "mailbox", "mail_id": 5, "kind": "approval"}
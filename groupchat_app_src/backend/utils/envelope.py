@@ -0,0 +1,127 @@
+import os
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy import select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from db import BackgroundSessionLocal, GroupDataKey
+from utils.cache import LRUCache
+from utils.security import encrypt, decrypt, decrypt_many_async, message_plaintext_cache
+
+# ---------------------------------------------------------
+# MESSAGE BODY ENVELOPE ENCRYPTION
+# ---------------------------------------------------------
+# "fernet" (default): messages.content holds a Fernet token, as before.
+# "aesgcm": messages.content_enc holds 0x01 | nonce(12) | ciphertext+tag under a
+# per-group AES-256 data key, and content is ''. Data keys are stored wrapped by
+# the master key in group_data_keys (so key_rotation rewraps them).
+# Reads handle both formats whatever the setting.
+MESSAGE_ENCRYPTION = os.getenv("MESSAGE_ENCRYPTION", "fernet").lower()
+
+ENVELOPE_V1 = b"\x01"
+_NONCE_BYTES = 12
+# must fit messages.content_enc; longer bodies fall back to Fernet in content
+ENVELOPE_MAX_BYTES = 8192
+
+_data_keys = LRUCache(int(os.getenv("GROUP_DATA_KEY_CACHE_SIZE", "4096")))
+
+
+def _aad(group_id: int) -> bytes:
+    # binds the ciphertext to its group: a body copied to another group won't open
+    return b"group:%d" % group_id
+
+
+def seal(key: bytes, group_id: int, text: str) -> bytes:
+    nonce = os.urandom(_NONCE_BYTES)
+    return ENVELOPE_V1 + nonce + AESGCM(key).encrypt(nonce, text.encode(), _aad(group_id))
+
+
+def open_sealed(key: bytes, group_id: int, blob: bytes) -> str:
+    if blob[:1] != ENVELOPE_V1:
+        raise ValueError("unknown envelope version")
+    nonce, body = blob[1:1 + _NONCE_BYTES], blob[1 + _NONCE_BYTES:]
+    return AESGCM(key).decrypt(nonce, body, _aad(group_id)).decode()
+
+
+async def group_data_key(group_id: int, create: bool = False) -> bytes | None:
+    """Unwrapped data key for a group (cached); created on first use when create=True."""
+    key = _data_keys.get(group_id)
+    if key is not None:
+        return key
+
+    # called from summaries, the archiver and task handlers as well as requests,
+    # and misses are rare (once per group per process): keep it off the request pool
+    async with BackgroundSessionLocal() as session:
+        wrapped = (await session.execute(
+            select(GroupDataKey.wrapped_key).where(GroupDataKey.group_id == group_id)
+        )).scalar_one_or_none()
+        if wrapped is None:
+            if not create:
+                return None
+            # two writers racing both insert; IGNORE keeps the first and both re-read it
+            await session.execute(
+                mysql_insert(GroupDataKey).prefix_with("IGNORE").values(
+                    group_id=group_id, wrapped_key=encrypt(AESGCM.generate_key(bit_length=256).hex())
+                )
+            )
+            await session.commit()
+            wrapped = (await session.execute(
+                select(GroupDataKey.wrapped_key).where(GroupDataKey.group_id == group_id)
+            )).scalar_one()
+
+    key = bytes.fromhex(decrypt(wrapped))
+    _data_keys.set(group_id, key)
+    return key
+
+
+async def seal_message(group_id: int, text: str) -> dict:
+    """Column values for a new Message body: Message(..., **await seal_message(gid, text))."""
+    if MESSAGE_ENCRYPTION == "aesgcm":
+        key = await group_data_key(group_id, create=True)
+        blob = seal(key, group_id, text)
+        if len(blob) <= ENVELOPE_MAX_BYTES:
+            return {"content": "", "content_enc": blob}
+    return {"content": encrypt(text), "content_enc": None}
+
+
+def open_body(content: str, content_enc: bytes | None, key: bytes | None, group_id: int) -> str:
+    """Plaintext of one stored body, for code that already holds the group key."""
+    if content_enc:
+        if key is None:
+            raise ValueError(f"no data key for group {group_id}")
+        return open_sealed(key, group_id, content_enc)
+    return decrypt(content)
+
+
+async def decrypt_messages(messages, strict: bool = True) -> list[str | None]:
+    """
+    Plaintext for Message / MessageArchive rows (ids are shared), via the
+    plaintext cache. Fernet and envelope rows can be mixed in one batch.
+    """
+    out: list[str | None] = [None] * len(messages)
+    fernet, sealed = [], []
+    for i, m in enumerate(messages):
+        plain = message_plaintext_cache.get(m.id)
+        if plain is not None:
+            out[i] = plain
+        elif m.content_enc:
+            sealed.append(i)
+        else:
+            fernet.append(i)
+
+    if fernet:
+        plains = await decrypt_many_async([messages[i].content for i in fernet], strict)
+        for i, plain in zip(fernet, plains):
+            out[i] = plain
+
+    # AES-GCM is cheap enough to stay on the event loop
+    for i in sealed:
+        m = messages[i]
+        try:
+            out[i] = open_sealed(await group_data_key(m.group_id), m.group_id, m.content_enc)
+        except Exception:
+            if strict:
+                raise
+
+    for i in fernet + sealed:
+        if out[i] is not None:
+            message_plaintext_cache.set(messages[i].id, out[i])
+    return out
@@ -0,0 +1,134 @@
+import os
+import uuid
+from sqlalchemy import select, update, text, desc, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from db import JobRun, JobStatus
+
+# jobs worker.py knows how to run; the web tier may only enqueue these
+JOB_NAMES = ("daily_summary", "message_archive", "key_rotation", "seq_backfill")
+
+# a worker that stops heartbeating loses the job after this long
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+# telemetry fields a job may report that get their own column
+_STAT_COLUMNS = ("groups_processed", "llm_calls", "prompt_tokens", "completion_tokens")
+
+
+async def enqueue_job(session, job_name: str, run_key: str | None = None, requested_by: int | None = None) -> bool:
+    """
+    Queue one run of a job. Scheduled runs pass a run_key (e.g. the date), so
+    the same run enqueued by several processes collapses into one row; a run
+    that failed (or was abandoned) is queued again.
+    Returns False if that run is already queued, running or done.
+    """
+    if job_name not in JOB_NAMES:
+        raise ValueError(f"Unknown job {job_name}")
+    run_key = run_key or f"manual:{uuid.uuid4().hex}"
+    result = await session.execute(mysql_insert(JobRun).prefix_with("IGNORE").values(
+        job_name=job_name,
+        run_key=run_key,
+        status=JobStatus.queued,
+        requested_by=requested_by,
+    ))
+    if result.rowcount == 0:
+        # a separate UPDATE rather than ON DUPLICATE KEY: its rowcount is unambiguous
+        result = await session.execute(
+            update(JobRun)
+            .where(JobRun.job_name == job_name, JobRun.run_key == run_key,
+                   JobRun.status == JobStatus.failed)
+            .values(status=JobStatus.queued, requested_by=requested_by, owner=None,
+                    queued_at=func.now(), started_at=None, finished_at=None, error=None)
+            .execution_options(synchronize_session=False)
+        )
+    await session.commit()
+    return result.rowcount == 1
+
+
+async def acquire_lease(session, job_name: str, owner: str, seconds: int = JOB_LEASE_SECONDS) -> bool:
+    """
+    Take (or extend) the lease for job_name. Only one owner holds an unexpired
+    lease at a time; DB time is used so worker clocks don't matter.
+    """
+    # assignments run left to right: lease_until sees the owner just written
+    await session.execute(text("""
+        INSERT INTO job_leases (job_name, owner, lease_until)
+        VALUES (:job, :owner, NOW() + INTERVAL :secs SECOND)
+        ON DUPLICATE KEY UPDATE
+            owner = IF(lease_until < NOW() OR owner = VALUES(owner), VALUES(owner), owner),
+            lease_until = IF(owner = VALUES(owner), VALUES(lease_until), lease_until)
+    """), {"job": job_name, "owner": owner, "secs": seconds})
+    holder = (await session.execute(
+        text("SELECT owner FROM job_leases WHERE job_name = :job"), {"job": job_name}
+    )).scalar()
+    await session.commit()
+    return holder == owner
+
+
+async def release_lease(session, job_name: str, owner: str):
+    await session.execute(
+        text("UPDATE job_leases SET lease_until = NOW() WHERE job_name = :job AND owner = :owner"),
+        {"job": job_name, "owner": owner},
+    )
+    await session.commit()
+
+
+async def requeue_orphans(session, job_name: str) -> int:
+    """Runs left 'running' by a worker that died. Only call while holding the lease."""
+    result = await session.execute(
+        update(JobRun)
+        .where(JobRun.job_name == job_name, JobRun.status == JobStatus.running)
+        .values(status=JobStatus.queued, owner=None, started_at=None)
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def claim_next_run(session, job_name: str, owner: str) -> JobRun | None:
+    run = (await session.execute(
+        select(JobRun)
+        .where(JobRun.job_name == job_name, JobRun.status == JobStatus.queued)
+        .order_by(JobRun.id)
+        .limit(1)
+    )).scalar_one_or_none()
+    if run is None:
+        return None
+    run.status = JobStatus.running
+    run.owner = owner
+    run.started_at = func.now()
+    await session.commit()
+    await session.refresh(run)
+    return run
+
+
+async def finish_run(
+    session, run_id: int, duration_ms: int, stats: dict | None = None, error: str | None = None,
+    owner: str | None = None
+) -> bool:
+    """
+    Record the outcome. With owner, only while that owner still holds the run
+    (a run requeued by another worker after a lost lease is left alone).
+    """
+    stats = stats or {}
+    values = {
+        "status": JobStatus.failed if error else JobStatus.succeeded,
+        "finished_at": func.now(),
+        "duration_ms": duration_ms,
+        "stats": stats,
+        "error": error,
+    }
+    for col in _STAT_COLUMNS:
+        if col in stats:
+            values[col] = stats[col]
+    stmt = update(JobRun).where(JobRun.id == run_id)
+    if owner is not None:
+        stmt = stmt.where(JobRun.owner == owner, JobRun.status == JobStatus.running)
+    result = await session.execute(stmt.values(**values))
+    await session.commit()
+    return result.rowcount == 1
+
+
+async def recent_runs(session, job_name: str | None = None, limit: int = 50) -> list[JobRun]:
+    stmt = select(JobRun).order_by(desc(JobRun.id)).limit(limit)
+    if job_name:
+        stmt = stmt.where(JobRun.job_name == job_name)
+    return list((await session.execute(stmt)).scalars().all())
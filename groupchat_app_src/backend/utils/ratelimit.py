@@ -0,0 +1,112 @@
+import os
+import time
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+from db import SessionLocal
+from utils.cache import LRUCache
+
+# ---------------------------------------------------------
+# TOKEN BUCKET RATE LIMITS
+# ---------------------------------------------------------
+# Checked before any bcrypt work on the auth routes. Each limit is
+# "<burst>/<seconds>": up to <burst> requests at once, refilled evenly over
+# <seconds>. RATE_LIMIT_STORE=memory keeps buckets per process (fine for one
+# uvicorn worker); =db shares them through the rate_limit_buckets table.
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory").lower()
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# behind a reverse proxy the client is the first X-Forwarded-For entry
+TRUST_X_FORWARDED_FOR = os.getenv("TRUST_X_FORWARDED_FOR", "0") == "1"
+
+
+def _parse_limit(value: str) -> tuple[float, float]:
+    burst, _, seconds = value.partition("/")
+    burst, seconds = float(burst), float(seconds or 60)
+    return burst, burst / seconds
+
+
+# scope -> (capacity, tokens per second)
+LIMITS = {
+    "login_ip": _parse_limit(os.getenv("RATE_LIMIT_LOGIN_IP", "20/60")),
+    # credential stuffing spreads over IPs, so the target account gets its own bucket
+    "login_user": _parse_limit(os.getenv("RATE_LIMIT_LOGIN_USER", "5/60")),
+    "signup_ip": _parse_limit(os.getenv("RATE_LIMIT_SIGNUP_IP", "5/600")),
+    # /api/operator/signup is unauthenticated
+    "operator_signup_ip": _parse_limit(os.getenv("RATE_LIMIT_OPERATOR_SIGNUP_IP", "3/3600")),
+}
+
+# key -> [tokens, last refill (monotonic)]
+_buckets = LRUCache(int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_X_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _take_memory(key: str, capacity: float, rate: float) -> float:
+    now = time.monotonic()
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = [capacity, now]
+        _buckets.set(key, bucket)
+    tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+    # denied requests don't dig the bucket deeper than one token of debt
+    bucket[0] = max(tokens - 1, -1.0)
+    bucket[1] = now
+    return bucket[0]
+
+
+async def _take_db(key: str, capacity: float, rate: float) -> float:
+    # one atomic upsert: refill by elapsed time, then take a token (floor -1, as above);
+    # DB time is used so worker clocks don't matter
+    async with SessionLocal() as session:
+        await session.execute(text("""
+            INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at)
+            VALUES (:key, :cap - 1, NOW(6))
+            ON DUPLICATE KEY UPDATE
+                tokens = GREATEST(
+                    LEAST(:cap, tokens + TIMESTAMPDIFF(MICROSECOND, updated_at, NOW(6)) / 1000000 * :rate) - 1,
+                    -1),
+                updated_at = NOW(6)
+        """), {"key": key, "cap": capacity, "rate": rate})
+        tokens = (await session.execute(
+            text("SELECT tokens FROM rate_limit_buckets WHERE bucket_key = :key"), {"key": key}
+        )).scalar()
+        await session.commit()
+    return float(tokens)
+
+
+async def take(scope: str, key: str) -> float | None:
+    """Take one token from scope's bucket for key. Returns None if allowed, else seconds until retry."""
+    capacity, rate = LIMITS[scope]
+    bucket_key = f"{scope}:{key}"[:191]
+    if RATE_LIMIT_STORE == "db":
+        tokens = await _take_db(bucket_key, capacity, rate)
+    else:
+        tokens = _take_memory(bucket_key, capacity, rate)
+    if tokens >= 0:
+        return None
+    # the next request is allowed once a full token has refilled
+    return (1 - tokens) / rate
+
+
+async def enforce(*checks: tuple[str, str]):
+    """
+    Raise 429 unless every (scope, key) bucket has a token. All buckets are
+    charged, so an attacker rotating IPs still drains the per-account one.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    retry_after = 0.0
+    for scope, key in checks:
+        wait = await take(scope, key)
+        if wait is not None:
+            retry_after = max(retry_after, wait)
+    if retry_after:
+        raise HTTPException(
+            429, "Too many attempts, try again later",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
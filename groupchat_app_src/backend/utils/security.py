@@ -1,6 +1,8 @@
 import os
-from cryptography.fernet import Fernet
+import asyncio
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from dotenv import load_dotenv
+from utils.cache import LRUCache
 
 
 load_dotenv() 
@@ -9,12 +11,109 @@ load_dotenv()
 ENCRYPTION_KEY = os.environ.get("MY_APP_SECRET_KEY")
 if not ENCRYPTION_KEY:
     raise ValueError("MY_APP_SECRET_KEY missing for encryption")
-    
-cipher_suite = Fernet(ENCRYPTION_KEY.encode())
+
+# ---------------------------------------------------------
+# KEYS
+# ---------------------------------------------------------
+# New ciphertext is "v<version>:<fernet token>" under MY_APP_SECRET_KEY.
+# To rotate: move the old key into MY_APP_OLD_SECRET_KEYS as "<version>:<key>",
+# set the new key and bump MY_APP_SECRET_KEY_VERSION, then run the
+# key_rotation job. Unprefixed tokens predate versioning and are tried
+# against every key.
+
+ENCRYPTION_KEY_VERSION = int(os.getenv("MY_APP_SECRET_KEY_VERSION", "1"))
+
+_keys: dict[int, Fernet] = {ENCRYPTION_KEY_VERSION: Fernet(ENCRYPTION_KEY.encode())}
+for _entry in filter(None, os.getenv("MY_APP_OLD_SECRET_KEYS", "").split(",")):
+    _version, _, _key = _entry.strip().partition(":")
+    if not _key:
+        raise ValueError("MY_APP_OLD_SECRET_KEYS entries must look like <version>:<key>")
+    _keys.setdefault(int(_version), Fernet(_key.encode()))
+
+cipher_suite = _keys[ENCRYPTION_KEY_VERSION]
+# current key first: MultiFernet encrypts with it and decrypts with any
+multi_cipher = MultiFernet([cipher_suite] + [f for v, f in _keys.items() if v != ENCRYPTION_KEY_VERSION])
+
+CIPHERTEXT_PREFIX = f"v{ENCRYPTION_KEY_VERSION}:"
+
+
+def _split(token: str) -> tuple[Fernet | MultiFernet, str]:
+    # fernet tokens are urlsafe base64, so ':' only ever comes from our prefix
+    head, sep, body = token.partition(":")
+    if sep and head[:1] == "v" and head[1:].isdigit():
+        key = _keys.get(int(head[1:]))
+        if key is None:
+            raise InvalidToken(f"no key configured for version {head[1:]}")
+        return key, body
+    return multi_cipher, token
 
 
 def encrypt(text: str) -> str:
-    return cipher_suite.encrypt(text.encode()).decode()
+    return CIPHERTEXT_PREFIX + cipher_suite.encrypt(text.encode()).decode()
 
 def decrypt(token: str) -> str:
-    return cipher_suite.decrypt(token.encode()).decode()
\ No newline at end of file
+    cipher, body = _split(token)
+    return cipher.decrypt(body.encode()).decode()
+
+def needs_rotation(token: str | None) -> bool:
+    return bool(token) and not token.startswith(CIPHERTEXT_PREFIX)
+
+def rotate(token: str) -> str:
+    """Re-encrypt under the current key, keeping the original token timestamp."""
+    _, body = _split(token)
+    return CIPHERTEXT_PREFIX + multi_cipher.rotate(body.encode()).decode()
+
+# ---------------------------------------------------------
+# BULK DECRYPTION
+# ---------------------------------------------------------
+
+# batches bigger than this are decrypted in a worker thread instead of on the event loop
+DECRYPT_OFFLOAD_THRESHOLD = int(os.getenv("DECRYPT_OFFLOAD_THRESHOLD", "64"))
+# plaintext of recently read messages, keyed by message id (memory only, never persisted)
+MESSAGE_PLAINTEXT_CACHE_SIZE = int(os.getenv("MESSAGE_PLAINTEXT_CACHE_SIZE", "20000"))
+
+message_plaintext_cache = LRUCache(MESSAGE_PLAINTEXT_CACHE_SIZE)
+
+
+def decrypt_many(tokens: list[str], strict: bool = True) -> list[str | None]:
+    """decrypt() over a batch, in order. strict=False gives None for rows that fail instead of raising."""
+    if strict:
+        return [decrypt(t) for t in tokens]
+    out = []
+    for t in tokens:
+        try:
+            out.append(decrypt(t))
+        except Exception:
+            out.append(None)
+    return out
+
+
+async def decrypt_many_async(tokens: list[str], strict: bool = True) -> list[str | None]:
+    if len(tokens) > DECRYPT_OFFLOAD_THRESHOLD:
+        return await asyncio.to_thread(decrypt_many, tokens, strict)
+    return decrypt_many(tokens, strict)
+
+
+async def decrypt_cached(items: list[tuple], cache: LRUCache = message_plaintext_cache,
+                         strict: bool = True) -> list[str | None]:
+    """
+    items: [(cache_key, token), ...]. Only cache misses are decrypted (as one batch);
+    the cache is touched on the event loop thread only.
+    """
+    out: list[str | None] = [None] * len(items)
+    misses = []
+    for i, (key, token) in enumerate(items):
+        plain = cache.get(key)
+        if plain is None:
+            misses.append(i)
+        else:
+            out[i] = plain
+
+    if misses:
+        plains = await decrypt_many_async([items[i][1] for i in misses], strict)
+        for i, plain in zip(misses, plains):
+            out[i] = plain
+            if plain is not None:
+                cache.set(items[i][0], plain)
+    return out
+
@@ -1,9 +1,17 @@
+import os
 import asyncio
-from datetime import datetime, timedelta, timezone
-from collections import defaultdict
-from sqlalchemy import select
-from db import SessionLocal, ChatGroups, Message, DailyUserSummary
-from utils.security import encrypt, decrypt
+import traceback
+from datetime import date, datetime, timedelta, timezone
+from itertools import takewhile
+from sqlalchemy import select, insert, update, delete, bindparam, func, and_, or_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from db import (
+    BackgroundSessionLocal, ChatGroups, Message, MessageFlagLog, MessageArchive,
+    MessageFlagLogArchive, DailyUserSummary, SummaryCheckpoint, UserTherapistChat,
+    GroupRollingSummary, GroupDataKey, KeyRotationProgress, SeqBackfillProgress
+)
+from utils.security import encrypt, needs_rotation, rotate, ENCRYPTION_KEY_VERSION
+from utils.envelope import group_data_key, open_body
 from model.chatbot import MentalHealthChatbot
 
 _chatbot: MentalHealthChatbot | None = None
@@ -15,84 +23,410 @@ def get_chatbot() -> MentalHealthChatbot:
     return _chatbot
 
 
-async def generate_daily_summaries():
-    bot = get_chatbot()
-    async with SessionLocal() as session:
-        stmt = select(ChatGroups).where(ChatGroups.is_active == True)
-        groups = (await session.execute(stmt)).scalars().all()
+# ---------------------------------------------------------
+# DAILY SUMMARIES
+# ---------------------------------------------------------
 
-        now = datetime.now(timezone.utc)
-        yesterday_date = (now - timedelta(days=1)).date()
-        day_start = datetime(
-            year=yesterday_date.year,
-            month=yesterday_date.month,
-            day=yesterday_date.day,
-            tzinfo=timezone.utc,
+# groups summarized at once
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+# rows fetched per page of a group's day
+SUMMARY_STREAM_ROWS = int(os.getenv("SUMMARY_STREAM_ROWS", "500"))
+
+_summary_lock = asyncio.Lock()
+
+
+def _summary_window(now: datetime | None = None) -> tuple[date, datetime, datetime]:
+    """Yesterday (UTC) as (date, start, end)."""
+    now = now or datetime.now(timezone.utc)
+    summary_date = (now - timedelta(days=1)).date()
+    day_start = datetime(summary_date.year, summary_date.month, summary_date.day, tzinfo=timezone.utc)
+    return summary_date, day_start, day_start + timedelta(days=1)
+
+
+async def _page_into(summarizer, group_id: int, day_start: datetime, day_end: datetime) -> int:
+    """
+    Feed the day's messages to the summarizer a page at a time (keyset paging),
+    so a very active day never sits in memory all at once. Each page is read
+    and its connection returned before the LLM work it triggers starts, so no
+    result set stays open for minutes. LLM errors propagate: the group is then
+    not checkpointed and is redone on the next run.
+    """
+    key = None
+    undecryptable = 0
+
+    def _feed(rows) -> int:
+        skipped = 0
+        for _, user_id, content, content_enc, _ in rows:
+            if not user_id:
+                continue
+            try:
+                text = open_body(content, content_enc, key, group_id)
+            except Exception:
+                skipped += 1
+                continue
+            # may run a batch of map-step LLM calls
+            summarizer.add(user_id, text)
+        return skipped
+
+    n, after = 0, None
+    while True:
+        # keyset on (created_at, id): the order of ix_messages_group_bot_created,
+        # so each page is a range scan from where the last one stopped
+        stmt = (
+            select(Message.id, Message.user_id, Message.content, Message.content_enc, Message.created_at)
+            .where(
+                Message.group_id == group_id,
+                Message.is_bot == False,
+                Message.created_at >= day_start,
+                Message.created_at < day_end,
+            )
+            .order_by(Message.created_at, Message.id)
+            .limit(SUMMARY_STREAM_ROWS)
+        )
+        if after is not None:
+            stmt = stmt.where(or_(
+                Message.created_at > after[0],
+                and_(Message.created_at == after[0], Message.id > after[1]),
+            ))
+        async with BackgroundSessionLocal() as session:
+            rows = (await session.execute(stmt)).all()
+        if not rows:
+            break
+        if key is None and any(r.content_enc for r in rows):
+            key = await group_data_key(group_id)
+        # decryption + any chunk condensing it triggers run off the event loop
+        undecryptable += await asyncio.to_thread(_feed, rows)
+        n += len(rows)
+        after = (rows[-1].created_at, rows[-1].id)
+        if len(rows) < SUMMARY_STREAM_ROWS:
+            break
+
+    if undecryptable:
+        print(f"  - group {group_id}: skipped {undecryptable} undecryptable messages")
+    return n
+
+
+async def _summarize_group_day(bot, group_id: int, summary_date: date, day_start: datetime, day_end: datetime) -> int:
+    summarizer = bot.group_summarizer()
+    n_messages = await _page_into(summarizer, group_id, day_start, day_end)
+
+    rows = []
+    if n_messages:
+        summary_data = await asyncio.to_thread(summarizer.finish)
+        for uid_key, info in summary_data.items():
+            try:
+                u_id = int(uid_key)
+            except ValueError:
+                continue
+            rows.append({
+                "group_id": group_id,
+                "user_id": u_id,
+                "summary_date": summary_date,
+                "summary_text": encrypt(info.get("summary", "")),
+                "mood": encrypt(info.get("mood", "neutral")),
+            })
+
+    async with BackgroundSessionLocal() as session:
+        if rows:
+            stmt = mysql_insert(DailyUserSummary).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                summary_text=stmt.inserted.summary_text,
+                mood=stmt.inserted.mood,
+            )
+            await session.execute(stmt)
+
+        # committed together with the summaries: a group is either done or redone
+        await session.execute(
+            mysql_insert(SummaryCheckpoint).prefix_with("IGNORE")
+            .values(summary_date=summary_date, group_id=group_id)
         )
-        day_end = day_start + timedelta(days=1)
-
-        for group in groups:
-            
-            stmt_msgs = (
-                select(Message)
-                .where(
-                    Message.group_id == group.id,
-                    Message.created_at >= day_start,
-                    Message.created_at < day_end,
-                    Message.is_bot == False,
+        await session.commit()
+    return len(rows)
+
+
+async def generate_daily_summaries() -> dict:
+    """
+    Summarize yesterday for every active group. Groups fan out over at most
+    SUMMARY_CONCURRENCY workers; finished groups are checkpointed, so a rerun
+    after a crash only does the rest. Returns stats for the job telemetry.
+    """
+    if _summary_lock.locked():
+        print("[daily summary] already running, skipped.")
+        return {"skipped": True}
+
+    async with _summary_lock:
+        summary_date, day_start, day_end = _summary_window()
+
+        async with BackgroundSessionLocal() as session:
+            done = select(SummaryCheckpoint.group_id).where(SummaryCheckpoint.summary_date == summary_date)
+            group_ids = (await session.execute(
+                select(ChatGroups.id).where(ChatGroups.is_active == True, ChatGroups.id.not_in(done))
+            )).scalars().all()
+
+        if not group_ids:
+            print(f"[{datetime.now()}] daily summary for {summary_date}: nothing to do.")
+            return {"summary_date": str(summary_date), "groups_processed": 0}
+
+        # the model load is slow and blocking, keep it off the event loop
+        bot = await asyncio.to_thread(get_chatbot)
+        usage_before = bot.llm.usage_snapshot()
+        sem = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+        stats = {"summary_date": str(summary_date), "groups_processed": 0, "groups_failed": 0, "user_summaries": 0}
+
+        async def _run(group_id: int):
+            async with sem:
+                try:
+                    n = await _summarize_group_day(bot, group_id, summary_date, day_start, day_end)
+                    stats["groups_processed"] += 1
+                    stats["user_summaries"] += n
+                    print(f"  - group {group_id}: {n} user summaries")
+                except Exception:
+                    # not checkpointed, so the next run redoes this group
+                    stats["groups_failed"] += 1
+                    print(f"  - group {group_id} failed:\n{traceback.format_exc()}")
+
+        await asyncio.gather(*(_run(gid) for gid in group_ids))
+
+        usage = bot.llm.usage_snapshot()
+        stats["llm_calls"] = usage["calls"] - usage_before["calls"]
+        stats["prompt_tokens"] = usage["prompt_tokens"] - usage_before["prompt_tokens"]
+        stats["completion_tokens"] = usage["completion_tokens"] - usage_before["completion_tokens"]
+
+    print(f"[{datetime.now()}] daily summary for {summary_date} finished ({len(group_ids)} groups).")
+    return stats
+
+
+# ---------------------------------------------------------
+# HOT / COLD MESSAGE ARCHIVER
+# ---------------------------------------------------------
+
+# at least 2 days: the daily summary job reads yesterday from the hot table
+MESSAGE_HOT_DAYS = max(2, int(os.getenv("MESSAGE_HOT_DAYS", "90")))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "2000"))
+# pause between batches so the archiver never hogs the table / replication
+ARCHIVE_BATCH_PAUSE = float(os.getenv("ARCHIVE_BATCH_PAUSE", "0.2"))
+
+_ARCHIVE_MESSAGE_COLS = [c.name for c in MessageArchive.__table__.columns]
+_ARCHIVE_FLAG_COLS = [c.name for c in MessageFlagLogArchive.__table__.columns]
+
+
+async def archive_old_messages() -> dict:
+    """
+    Move messages older than MESSAGE_HOT_DAYS (and their flag logs) to the
+    archive tables. Each batch is one short transaction: copy, then delete from
+    the hot table, so a crash mid-run loses nothing and the next run resumes.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=MESSAGE_HOT_DAYS)
+    moved = 0
+    while True:
+        async with BackgroundSessionLocal() as session:
+            # ids grow with created_at, so the old rows are a prefix of the
+            # primary key: walk it from the start instead of scanning created_at
+            rows = (await session.execute(
+                select(Message.id, (Message.created_at < cutoff).label("old"))
+                .order_by(Message.id)
+                .limit(ARCHIVE_BATCH_SIZE)
+            )).all()
+            batch = [r.id for r in takewhile(lambda r: r.old, rows)]
+            if not batch:
+                break
+
+            in_batch = Message.id.between(batch[0], batch[-1])
+            await session.execute(
+                insert(MessageArchive).prefix_with("IGNORE").from_select(
+                    _ARCHIVE_MESSAGE_COLS,
+                    select(*(Message.__table__.c[c] for c in _ARCHIVE_MESSAGE_COLS)).where(in_batch),
                 )
             )
-            msgs = (await session.execute(stmt_msgs)).scalars().all()
+            await session.execute(
+                insert(MessageFlagLogArchive).prefix_with("IGNORE").from_select(
+                    _ARCHIVE_FLAG_COLS,
+                    select(*(MessageFlagLog.__table__.c[c] for c in _ARCHIVE_FLAG_COLS))
+                    .where(MessageFlagLog.message_id.between(batch[0], batch[-1])),
+                )
+            )
+            # flag logs go with their message (ON DELETE CASCADE)
+            await session.execute(
+                delete(Message).where(in_batch).execution_options(synchronize_session=False)
+            )
+            await session.commit()
 
-            if not msgs:
-                continue
+        moved += len(batch)
+        if len(batch) < ARCHIVE_BATCH_SIZE:
+            break
+        await asyncio.sleep(ARCHIVE_BATCH_PAUSE)
 
-            user_conversations = defaultdict(list)
-            for m in msgs:
-                if m.user_id:
-                    try:
-                        text = decrypt(m.content)
-                        user_conversations[str(m.user_id)].append(text)
-                    except Exception:
-                        pass
-            
-            if not user_conversations:
-                continue
+    print(f"[{datetime.now()}] archived {moved} messages older than {cutoff.date()}.")
+    return {"messages_archived": moved, "cutoff": str(cutoff.date())}
 
-            try:
-                summary_data = await bot.summarize_group(dict(user_conversations))
-
-                for uid_key, info in summary_data.items():
-                    try:
-                        u_id = int(uid_key)
-                        print(info.get("summary", ""))
-                        print(info.get("mood", "neutral"))
-                        summary_text = encrypt(info.get("summary", ""))
-                        mood = encrypt(info.get("mood", "neutral"))
-                        exists_stmt = select(DailyUserSummary).where(
-                            DailyUserSummary.group_id == group.id,
-                            DailyUserSummary.user_id == u_id,
-                            DailyUserSummary.summary_date == yesterday_date,
-                        )
-                        existed = (await session.execute(exists_stmt)).scalar_one_or_none()
-                        if existed:
-                            existed.summary_text = summary_text
-                            existed.mood = mood
-                            session.add(existed)
-                        else:
-                            record = DailyUserSummary(
-                                group_id=group.id,
-                                user_id=u_id,
-                                summary_date=yesterday_date,
-                                summary_text=summary_text,
-                                mood=mood,
-                            )
-                            session.add(record)
-
-                    except ValueError:
-                        continue
-                await session.commit()
-                
-            except Exception as e:
-                print(f"  - group {group.id} failed: {e}")
-    print(f"[{datetime.now()}] daily summary finished.")
\ No newline at end of file
+
+# ---------------------------------------------------------
+# KEY ROTATION (re-encrypt under the current key)
+# ---------------------------------------------------------
+
+ROTATION_BATCH_SIZE = int(os.getenv("ROTATION_BATCH_SIZE", "1000"))
+# pause between batches, same idea as the archiver: short transactions, room for chat traffic
+ROTATION_BATCH_PAUSE = float(os.getenv("ROTATION_BATCH_PAUSE", "0.1"))
+
+# encrypted columns per table; hot messages go before the archive so rows the
+# archiver moves mid-run are already rotated
+ROTATION_TARGETS = (
+    (Message.__table__, ("content",)),
+    (MessageArchive.__table__, ("content",)),
+    (UserTherapistChat.__table__, ("message",)),
+    (DailyUserSummary.__table__, ("summary_text", "mood")),
+    (GroupRollingSummary.__table__, ("summary_text",)),
+    (GroupDataKey.__table__, ("wrapped_key",)),
+)
+
+
+def _rotate_rows(rows, cols) -> tuple[list[dict], int]:
+    """Bind params for rows that still have a column under an old key, and the number that failed."""
+    params, failed = [], 0
+    for row in rows:
+        old = dict(zip(cols, row[1:]))
+        if not any(needs_rotation(v) for v in old.values()):
+            continue
+        try:
+            new = {c: rotate(v) if needs_rotation(v) else v for c, v in old.items()}
+        except Exception:
+            failed += 1
+            continue
+        p = {"_pk": row[0]}
+        p.update({f"_old_{c}": v for c, v in old.items()})
+        p.update({f"_new_{c}": v for c, v in new.items()})
+        params.append(p)
+    return params, failed
+
+
+async def _rotate_table(table, cols) -> dict:
+    pk = table.primary_key.columns.values()[0]
+    # compare-and-set: a row edited since it was read is left for the next run
+    stmt = (
+        update(table)
+        .where(pk == bindparam("_pk"), *(table.c[c].is_not_distinct_from(bindparam(f"_old_{c}")) for c in cols))
+        .values({c: bindparam(f"_new_{c}") for c in cols})
+    )
+
+    async with BackgroundSessionLocal() as session:
+        progress = await session.get(KeyRotationProgress, (table.name, ENCRYPTION_KEY_VERSION))
+        if progress is not None and progress.finished_at is not None:
+            return {"rewritten": 0, "failed": 0}
+        cursor = progress.last_id if progress else 0
+
+    rewritten = failed = 0
+    while True:
+        async with BackgroundSessionLocal() as session:
+            rows = (await session.execute(
+                select(pk, *(table.c[c] for c in cols))
+                .where(pk > cursor)
+                .order_by(pk)
+                .limit(ROTATION_BATCH_SIZE)
+            )).all()
+            done = len(rows) < ROTATION_BATCH_SIZE
+
+            batch_rewritten = 0
+            if rows:
+                params, n_failed = await asyncio.to_thread(_rotate_rows, rows, cols)
+                if params:
+                    result = await session.execute(stmt.execution_options(synchronize_session=False), params)
+                    batch_rewritten = result.rowcount
+                failed += n_failed
+                cursor = rows[-1][0]
+
+            upsert = mysql_insert(KeyRotationProgress).values(
+                table_name=table.name, key_version=ENCRYPTION_KEY_VERSION,
+                last_id=cursor, rows_rewritten=batch_rewritten,
+                finished_at=func.now() if done else None,
+            )
+            await session.execute(upsert.on_duplicate_key_update(
+                last_id=upsert.inserted.last_id,
+                rows_rewritten=KeyRotationProgress.rows_rewritten + upsert.inserted.rows_rewritten,
+                finished_at=upsert.inserted.finished_at,
+            ))
+            await session.commit()
+
+        rewritten += batch_rewritten
+        if done:
+            break
+        await asyncio.sleep(ROTATION_BATCH_PAUSE)
+
+    print(f"[{datetime.now()}] key rotation: {table.name} rewrote {rewritten} rows ({failed} undecryptable).")
+    return {"rewritten": rewritten, "failed": failed}
+
+
+async def rotate_encryption_keys() -> dict:
+    """
+    Re-encrypt every encrypted column under the current key version, one
+    table at a time in PK order. Progress is stored per table and key version,
+    so the job can be stopped and rerun at any point.
+    """
+    stats = {"key_version": ENCRYPTION_KEY_VERSION, "rows_rewritten": 0, "rows_failed": 0}
+    for table, cols in ROTATION_TARGETS:
+        result = await _rotate_table(table, cols)
+        stats[table.name] = result["rewritten"]
+        stats["rows_rewritten"] += result["rewritten"]
+        stats["rows_failed"] += result["failed"]
+    return stats
+
+
+# ---------------------------------------------------------
+# SEQ BACKFILL (messages that predate messages.seq, migration 012)
+# ---------------------------------------------------------
+
+SEQ_BACKFILL_BATCH_SIZE = int(os.getenv("SEQ_BACKFILL_BATCH_SIZE", "2000"))
+SEQ_BACKFILL_BATCH_PAUSE = float(os.getenv("SEQ_BACKFILL_BATCH_PAUSE", "0.1"))
+
+# hot table first: rows the archiver moves after their batch carry their seq along,
+# rows it moved before are picked up by the archive pass
+SEQ_BACKFILL_TARGETS = (Message.__table__, MessageArchive.__table__)
+
+
+async def _backfill_seq_table(table) -> int:
+    async with BackgroundSessionLocal() as session:
+        progress = await session.get(SeqBackfillProgress, table.name)
+        if progress is None or progress.finished_at is not None:
+            return 0
+        cursor, upto = progress.last_id, progress.upto_id
+
+    updated = 0
+    while True:
+        hi = min(cursor + SEQ_BACKFILL_BATCH_SIZE, upto)
+        done = hi >= upto
+        async with BackgroundSessionLocal() as session:
+            # a PK range, so each batch locks at most SEQ_BACKFILL_BATCH_SIZE rows
+            result = await session.execute(
+                update(table)
+                .where(table.c.id > cursor, table.c.id <= hi,
+                       table.c.is_visible == True, table.c.seq.is_(None))
+                .values(seq=table.c.id)
+                .execution_options(synchronize_session=False)
+            )
+            await session.execute(
+                update(SeqBackfillProgress)
+                .where(SeqBackfillProgress.table_name == table.name)
+                .values(last_id=hi,
+                        rows_updated=SeqBackfillProgress.rows_updated + result.rowcount,
+                        finished_at=func.now() if done else None)
+            )
+            await session.commit()
+        updated += result.rowcount
+        cursor = hi
+        if done:
+            break
+        await asyncio.sleep(SEQ_BACKFILL_BATCH_PAUSE)
+
+    print(f"[{datetime.now()}] seq backfill: {table.name} updated {updated} rows.")
+    return updated
+
+
+async def backfill_message_seq() -> dict:
+    """
+    Give messages that were visible before migration 012 their seq (= id), in
+    PK-range batches. Progress is stored per table, so the job can be stopped
+    and rerun at any point; once finished it is a no-op.
+    """
+    stats = {}
+    for table in SEQ_BACKFILL_TARGETS:
+        stats[table.name] = await _backfill_seq_table(table)
+    return stats
@@ -0,0 +1,275 @@
+import os
+import socket
+import asyncio
+import traceback
+from datetime import datetime
+from sqlalchemy import select, update, delete, func, text
+from db import BackgroundSessionLocal, BackgroundTask, TaskStatus
+
+# ---------------------------------------------------------
+# DURABLE BACKGROUND TASKS
+# ---------------------------------------------------------
+# Follow-up work of a request (bot replies, safety alerts, centroid updates)
+# is a row in background_tasks instead of a bare create_task, so it survives a
+# restart and is retried. Every web process runs a dispatcher that claims rows
+# with SKIP LOCKED; each task type has its own concurrency limit, and types are
+# claimed in priority order so safety alerts never wait behind LLM replies.
+
+TASK_POLL_SECONDS = float(os.getenv("TASK_POLL_SECONDS", "1"))
+TASK_RETRY_BASE_SECONDS = float(os.getenv("TASK_RETRY_BASE_SECONDS", "5"))
+# finished tasks are kept this long for the metrics, then purged
+TASK_RETENTION_HOURS = int(os.getenv("TASK_RETENTION_HOURS", "72"))
+# a running task's lock; renewed while its handler runs, so only a dead
+# (or wedged) process lets it expire and another process reclaim the task
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "60"))
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class PermanentTaskError(Exception):
+    """Raised by a handler when retrying can't help: the task fails at once."""
+
+
+class TaskType:
+    def __init__(self, name: str, handler, priority: int, concurrency: int, max_attempts: int, timeout: int):
+        self.name = name
+        self.handler = handler
+        self.priority = priority            # lower runs first
+        self.concurrency = concurrency      # per process
+        self.max_attempts = max_attempts
+        self.timeout = timeout              # seconds a handler may run before it is cancelled
+
+
+TASK_TYPES: dict[str, TaskType] = {}
+
+_wakeup: asyncio.Event | None = None
+# task type -> tasks this process is running right now
+_in_flight: dict[str, int] = {}
+_dispatcher: asyncio.Task | None = None
+_heartbeat: asyncio.Task | None = None
+_running: set[asyncio.Task] = set()
+# ids of the tasks this process is running, for the lease heartbeat
+_running_ids: set[int] = set()
+
+
+def task_handler(name: str, priority: int = 5, concurrency: int = 1, max_attempts: int = 3, timeout: int = 300):
+    """Register an async function as the handler of a task type; it gets the payload as kwargs."""
+    def wrap(fn):
+        TASK_TYPES[name] = TaskType(
+            name, fn, priority,
+            int(os.getenv(f"TASK_CONCURRENCY_{name.upper()}", str(concurrency))),
+            max_attempts, timeout,
+        )
+        return fn
+    return wrap
+
+
+async def enqueue_task(task_type: str, payload: dict, session=None, priority: int | None = None,
+                       delay_seconds: float = 0):
+    """
+    Queue a task, to run no earlier than delay_seconds from now. Pass the
+    caller's session to make the task part of its transaction (it only exists
+    if the caller commits); without one it is committed on its own.
+    """
+    spec = TASK_TYPES[task_type]
+    row = BackgroundTask(
+        task_type=task_type,
+        payload=payload,
+        priority=spec.priority if priority is None else priority,
+        status=TaskStatus.queued,
+        max_attempts=spec.max_attempts,
+    )
+    if delay_seconds > 0:
+        row.run_after = func.date_add(func.now(), text(f"INTERVAL {int(delay_seconds * 1_000_000)} MICROSECOND"))
+    if session is not None:
+        session.add(row)
+    else:
+        async with BackgroundSessionLocal() as own:
+            own.add(row)
+            await own.commit()
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _claim(spec: TaskType, n: int) -> list[BackgroundTask]:
+    async with BackgroundSessionLocal() as session:
+        rows = (await session.execute(
+            select(BackgroundTask)
+            .where(
+                BackgroundTask.task_type == spec.name,
+                BackgroundTask.run_after <= func.now(),
+                # queued, or running under an owner that stopped heartbeating
+                (BackgroundTask.status == TaskStatus.queued) |
+                ((BackgroundTask.status == TaskStatus.running) & (BackgroundTask.locked_until < func.now())),
+            )
+            .order_by(BackgroundTask.priority, BackgroundTask.id)
+            .limit(n)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        claimed = []
+        for row in rows:
+            if row.attempts >= row.max_attempts:
+                # its last attempt died with its process (e.g. OOM): don't run it again
+                row.status = TaskStatus.failed
+                row.owner = None
+                row.finished_at = func.now()
+                row.error = f"abandoned: owner stopped heartbeating on attempt {row.attempts}/{row.max_attempts}"
+                print(f"[tasks] {spec.name} #{row.id} failed: {row.error}")
+                continue
+            row.status = TaskStatus.running
+            row.owner = OWNER
+            row.attempts += 1
+            row.started_at = func.now()
+            row.locked_until = func.date_add(func.now(), text(f"INTERVAL {TASK_LEASE_SECONDS} SECOND"))
+            claimed.append(row)
+        await session.commit()
+        return claimed
+
+
+async def _finish(task_id: int, attempts: int, max_attempts: int, error: str | None, retry: bool = True):
+    values = {"finished_at": func.now(), "error": error, "owner": None}
+    if error is None:
+        values["status"] = TaskStatus.succeeded
+    elif retry and attempts < max_attempts:
+        # retry with exponential backoff
+        delay = int(TASK_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+        values.update(status=TaskStatus.queued, finished_at=None,
+                      run_after=func.date_add(func.now(), text(f"INTERVAL {delay} SECOND")))
+    else:
+        values["status"] = TaskStatus.failed
+    async with BackgroundSessionLocal() as session:
+        # only while we still own it: after a lost lease another process may be running it
+        await session.execute(
+            update(BackgroundTask)
+            .where(BackgroundTask.id == task_id, BackgroundTask.owner == OWNER,
+                   BackgroundTask.status == TaskStatus.running)
+            .values(**values)
+        )
+        await session.commit()
+
+
+async def _run(spec: TaskType, task_id: int, attempts: int, max_attempts: int, payload: dict):
+    error, retry = None, True
+    _running_ids.add(task_id)
+    try:
+        await asyncio.wait_for(spec.handler(**(payload or {})), timeout=spec.timeout)
+    except PermanentTaskError as e:
+        error, retry = f"{type(e).__name__}: {e}", False
+        print(f"[tasks] {spec.name} #{task_id} failed permanently: {e}")
+    except Exception:
+        error = traceback.format_exc()
+        print(f"[tasks] {spec.name} #{task_id} attempt {attempts}/{max_attempts} failed:\n{error}")
+    finally:
+        _in_flight[spec.name] -= 1
+    try:
+        await _finish(task_id, attempts, max_attempts, error, retry)
+    finally:
+        _running_ids.discard(task_id)
+        if _wakeup is not None:
+            _wakeup.set()
+
+
+async def _heartbeat_loop():
+    """Extend the lock of every task this process is running, well before it expires."""
+    while True:
+        await asyncio.sleep(TASK_LEASE_SECONDS / 3)
+        if not _running_ids:
+            continue
+        try:
+            async with BackgroundSessionLocal() as session:
+                await session.execute(
+                    update(BackgroundTask)
+                    .where(BackgroundTask.id.in_(list(_running_ids)), BackgroundTask.owner == OWNER,
+                           BackgroundTask.status == TaskStatus.running)
+                    .values(locked_until=func.date_add(func.now(), text(f"INTERVAL {TASK_LEASE_SECONDS} SECOND")))
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+        except Exception as e:
+            # retried on the next beat; the lease is three beats long
+            print(f"[tasks] heartbeat: {e}")
+
+
+async def _purge():
+    async with BackgroundSessionLocal() as session:
+        await session.execute(
+            delete(BackgroundTask)
+            .where(
+                BackgroundTask.status.in_((TaskStatus.succeeded, TaskStatus.failed)),
+                BackgroundTask.finished_at < func.date_sub(func.now(), text(f"INTERVAL {TASK_RETENTION_HOURS} HOUR")),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+
+async def _dispatch_loop():
+    last_purge = 0.0
+    loop = asyncio.get_running_loop()
+    while True:
+        _wakeup.clear()
+        try:
+            for spec in sorted(TASK_TYPES.values(), key=lambda t: t.priority):
+                free = spec.concurrency - _in_flight[spec.name]
+                if free <= 0:
+                    continue
+                for row in await _claim(spec, free):
+                    _in_flight[spec.name] += 1
+                    t = asyncio.create_task(_run(spec, row.id, row.attempts, row.max_attempts, row.payload))
+                    _running.add(t)
+                    t.add_done_callback(_running.discard)
+            if loop.time() - last_purge > 3600:
+                last_purge = loop.time()
+                await _purge()
+        except Exception as e:
+            print(f"[tasks] dispatcher: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=TASK_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_task_workers():
+    global _wakeup, _dispatcher, _heartbeat
+    _wakeup = asyncio.Event()
+    for name in TASK_TYPES:
+        _in_flight[name] = 0
+    _dispatcher = asyncio.create_task(_dispatch_loop())
+    _heartbeat = asyncio.create_task(_heartbeat_loop())
+    print(f"[tasks] {OWNER} dispatching {', '.join(TASK_TYPES)}")
+
+
+async def stop_task_workers():
+    # running tasks are abandoned, not lost: their lock expires and another process retries them
+    tasks = [t for t in (_dispatcher, _heartbeat, *_running) if t is not None]
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def task_queue_metrics() -> dict:
+    """Per task type: rows by status, and the lag of the oldest ready task."""
+    async with BackgroundSessionLocal() as session:
+        counts = (await session.execute(
+            select(BackgroundTask.task_type, BackgroundTask.status, func.count())
+            .group_by(BackgroundTask.task_type, BackgroundTask.status)
+        )).all()
+        lags = (await session.execute(
+            select(
+                BackgroundTask.task_type,
+                func.timestampdiff(text("SECOND"), func.min(BackgroundTask.run_after), func.now()),
+            )
+            .where(BackgroundTask.status == TaskStatus.queued, BackgroundTask.run_after <= func.now())
+            .group_by(BackgroundTask.task_type)
+        )).all()
+
+    out = {
+        name: {"queued": 0, "running": 0, "succeeded": 0, "failed": 0, "lag_seconds": 0,
+               "concurrency": spec.concurrency, "in_flight_here": _in_flight.get(name, 0)}
+        for name, spec in TASK_TYPES.items()
+    }
+    for task_type, status, n in counts:
+        out.setdefault(task_type, {})[status.value] = n
+    for task_type, lag in lags:
+        out.setdefault(task_type, {})["lag_seconds"] = lag or 0
+    return {"owner": OWNER, "as_of": str(datetime.now()), "types": out}
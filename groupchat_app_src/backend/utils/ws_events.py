@@ -0,0 +1,24 @@
+import enum
+
+# ---------------------------------------------------------
+# WEBSOCKET EVENT CONTRACT
+# topic and frame names the frontend matches on; its copy is
+# src/ws/events.js, and tests/test_ws_contract.py keeps the two in sync
+# ---------------------------------------------------------
+
+MAILBOX_TOPIC = "mailbox"
+THERAPIST_CHAT_TOPIC = "therapist-chat"
+
+MAILBOX_EVENT = "mailbox"
+THERAPIST_CHAT_EVENT = "therapist_chat"
+
+
+class MailboxKind(str, enum.Enum):
+    alert = "alert"
+    direct_message = "direct_message"
+    approval = "approval"
+
+
+def mailbox_event(mail_id: int, kind: MailboxKind) -> dict:
+    """Frame pushed on MAILBOX_TOPIC when a mailbox item arrives."""
+    return {"type": MAILBOX_EVENT, "mail_id": mail_id, "kind": kind.value}
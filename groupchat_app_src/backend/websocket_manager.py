@@ -1,5 +1,10 @@
-from typing import List
+import os
+import json
+from collections import deque
+from typing import List, Iterable
 from fastapi import WebSocket
+from utils.cache import LRUCache
+from utils.ws_events import MAILBOX_TOPIC, THERAPIST_CHAT_TOPIC
 
 class ConnectionManager:
     def __init__(self):
@@ -24,3 +29,159 @@ class ConnectionManager:
                 except Exception:
                     pass
                 self.disconnect(connection)
+
+
+# topics a socket can subscribe to:
+#   group:<id>       messages / typing for one chat group
+#   mailbox          new mailbox items for this user
+#   therapist-chat   new user <-> therapist chat messages for this user
+# (MAILBOX_TOPIC / THERAPIST_CHAT_TOPIC come from utils/ws_events.py, shared with the frontend)
+
+def group_topic(group_id: int) -> str:
+    return f"group:{group_id}"
+
+
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, user_id: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        # None = client never subscribed (old clients) -> receives every frame for the user
+        self.topics: set[str] | None = None
+
+    def wants(self, topic: str | None) -> bool:
+        return topic is None or self.topics is None or topic in self.topics
+
+    def subscribe(self, topics: Iterable[str]):
+        if self.topics is None:
+            self.topics = set()
+        self.topics.update(topics)
+
+    def unsubscribe(self, topics: Iterable[str]):
+        if self.topics is not None:
+            self.topics.difference_update(topics)
+
+
+# resume cursors kept per process; they outlive sockets (that's what resume is for)
+ACK_CURSORS_MAX = int(os.getenv("WS_ACK_CURSORS_MAX", "50000"))
+
+
+class UserConnectionManager:
+    """
+    All open sockets, by user. A user may have several (two tabs, phone + laptop),
+    and each socket only gets frames for the topics it subscribed to.
+
+    A subscription is not an authorization: publishers pass the recipients
+    (for a group, its active members read at publish time), so a socket still
+    subscribed to a group its user has left gets nothing more from it.
+    """
+    def __init__(self):
+        self.active_users: dict[int, list[ClientConnection]] = {}
+        # (user_id, group_id) -> last seq the client acknowledged
+        self.last_acked = LRUCache(ACK_CURSORS_MAX)
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> ClientConnection:
+        await websocket.accept()
+        conn = ClientConnection(websocket, user_id)
+        self.active_users.setdefault(user_id, []).append(conn)
+        return conn
+
+    async def disconnect(self, conn: ClientConnection):
+        conns = self.active_users.get(conn.user_id)
+        if not conns:
+            return
+        if conn in conns:
+            conns.remove(conn)
+        if not conns:
+            del self.active_users[conn.user_id]
+
+    def record_ack(self, conn: ClientConnection, group_id: int, seq: int):
+        # only for groups the socket is subscribed to (and so was a member of)
+        if not conn.wants(group_topic(group_id)):
+            return
+        key = (conn.user_id, group_id)
+        if seq > self.last_acked.get(key, 0):
+            self.last_acked.set(key, seq)
+
+    def forget_acks(self, user_id: int, group_ids: Iterable[int]):
+        """Drop resume cursors for groups none of the user's sockets subscribes to any more."""
+        conns = self.active_users.get(user_id, ())
+        for gid in group_ids:
+            topic = group_topic(gid)
+            if not any(c.topics is not None and topic in c.topics for c in conns):
+                self.last_acked.pop((user_id, gid))
+
+    def drop_groups(self, user_id: int, group_ids: Iterable[int]):
+        """The user is no longer a member: unsubscribe all their sockets and forget the cursors."""
+        group_ids = list(group_ids)
+        topics = [group_topic(gid) for gid in group_ids]
+        for conn in self.active_users.get(user_id, ()):
+            conn.unsubscribe(topics)
+        self.forget_acks(user_id, group_ids)
+
+    def _targets(self, user_ids: Iterable[int], topic: str | None) -> list[ClientConnection]:
+        out = []
+        for uid in user_ids:
+            for conn in self.active_users.get(uid, ()):
+                if conn.wants(topic):
+                    out.append(conn)
+        return out
+
+    async def publish(self, user_ids: Iterable[int], message: dict, topic: str | None = None):
+        targets = self._targets(user_ids, topic)
+        if not targets:
+            return
+
+        # serialize once, only when someone actually displays it
+        frame = dict(message, topic=topic) if topic else message
+        text = json.dumps(frame, default=str)
+        for conn in targets:
+            try:
+                await conn.websocket.send_text(text)
+            except Exception:
+                await self.disconnect(conn)
+
+    async def send_to_user(self, user_id: int, message: dict, topic: str | None = None):
+        await self.publish((user_id,), message, topic)
+
+
+manager = UserConnectionManager()
+
+
+REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "200"))
+
+class GroupReplayBuffer:
+    """
+    Last few message frames per group, keyed by seq (the group's publish counter,
+    messages.seq), so a client that reconnects can be sent just the frames it
+    missed. Seqs are dense per group, so a gap means frames published by another
+    process or evicted. Process-local and lossy: when it can't prove it holds
+    the whole gap, callers fall back to the DB.
+    """
+    def __init__(self, size: int = REPLAY_BUFFER_SIZE):
+        self.size = size
+        self.frames: dict[int, deque] = {}
+
+    def append(self, group_id: int, seq: int, frame: dict):
+        buf = self.frames.get(group_id)
+        if buf is None:
+            buf = self.frames[group_id] = deque(maxlen=self.size)
+        buf.append((seq, frame))
+
+    def since(self, group_id: int, cursor: int) -> list[dict] | None:
+        """Frames with seq > cursor, oldest first; None if the gap is not fully buffered."""
+        buf = self.frames.get(group_id)
+        if not buf:
+            return None
+        out = []
+        expected = cursor + 1
+        for seq, frame in sorted(buf, key=lambda x: x[0]):
+            if seq < expected:
+                continue
+            if seq != expected:
+                return None
+            out.append(frame)
+            expected += 1
+        return out
+
+
+replay_buffer = GroupReplayBuffer()
@@ -0,0 +1,192 @@
+"""
+Background job worker: runs the scheduled jobs outside the web process.
+
+The web tier (and the cron schedule below) only insert rows into job_runs;
+this process picks them up. Any number of workers may run: a DB lease per
+job name makes sure exactly one of them runs a given job at a time, and a
+worker that dies mid-run loses its lease so another one resumes the run.
+
+Usage (from backend/):
+    python worker.py
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import traceback
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+from db import BackgroundSessionLocal
+from migrate import check_schema
+from utils.task import (
+    generate_daily_summaries, archive_old_messages, rotate_encryption_keys, backfill_message_seq
+)
+from utils.jobs import (
+    JOB_LEASE_SECONDS, enqueue_job, acquire_lease, release_lease,
+    requeue_orphans, claim_next_run, finish_run
+)
+
+JOBS = {
+    "daily_summary": generate_daily_summaries,
+    "message_archive": archive_old_messages,
+    # no schedule: queued by an operator (POST /api/ops/jobs/key_rotation) after a key change
+    "key_rotation": rotate_encryption_keys,
+    # one-off after migration 012; queued on startup, a no-op once finished
+    "seq_backfill": backfill_message_seq,
+}
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "5"))
+# finish yesterday's summaries if the last run was interrupted (checkpointed groups are skipped)
+SUMMARY_RESUME_ON_STARTUP = os.getenv("SUMMARY_RESUME_ON_STARTUP", "1") == "1"
+
+
+def _yesterday() -> str:
+    return str((datetime.now(timezone.utc) - timedelta(days=1)).date())
+
+def _today() -> str:
+    return str(datetime.now(timezone.utc).date())
+
+
+async def enqueue_scheduled(job_name: str, run_key: str):
+    async with BackgroundSessionLocal() as session:
+        if await enqueue_job(session, job_name, run_key=run_key):
+            print(f"[worker] queued {job_name} ({run_key})")
+
+# cron callbacks: the run key is the day, so every worker's cron enqueues the same row
+async def enqueue_daily_summary():
+    await enqueue_scheduled("daily_summary", _yesterday())
+
+async def enqueue_message_archive():
+    await enqueue_scheduled("message_archive", _today())
+
+
+class LeaseLost(Exception):
+    pass
+
+
+async def _heartbeat(job_name: str, stop: asyncio.Event, lost: asyncio.Event):
+    """Renew the lease until stop; set lost (and return) once it can't be held any more."""
+    renewed = time.monotonic()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=JOB_LEASE_SECONDS / 3)
+            continue
+        except asyncio.TimeoutError:
+            pass
+        try:
+            async with BackgroundSessionLocal() as session:
+                held = await acquire_lease(session, job_name, WORKER_ID)
+        except Exception as e:
+            # a DB blip is retried on the next beat, until the lease would have run out anyway
+            print(f"[worker] heartbeat for {job_name} failed: {e}")
+            held = time.monotonic() - renewed < JOB_LEASE_SECONDS
+        else:
+            if held:
+                renewed = time.monotonic()
+        if not held:
+            print(f"[worker] lost the lease on {job_name}, stopping the run")
+            lost.set()
+            return
+
+
+async def _run_while_leased(job_name: str, lost: asyncio.Event) -> dict | None:
+    """Run the job, cancelling it if the heartbeat loses the lease (another worker may take over)."""
+    job = asyncio.create_task(JOBS[job_name]())
+    watch = asyncio.create_task(lost.wait())
+    try:
+        await asyncio.wait({job, watch}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watch.cancel()
+    if not job.done():
+        job.cancel()
+        await asyncio.gather(job, return_exceptions=True)
+        raise LeaseLost(f"lease on {job_name} lost mid-run; run abandoned")
+    return job.result()
+
+
+async def run_pending(job_name: str):
+    """Run every queued run of job_name, if this worker can take its lease."""
+    async with BackgroundSessionLocal() as session:
+        if not await acquire_lease(session, job_name, WORKER_ID):
+            return
+        orphans = await requeue_orphans(session, job_name)
+        if orphans:
+            print(f"[worker] requeued {orphans} interrupted {job_name} run(s)")
+
+    stop, lost = asyncio.Event(), asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(job_name, stop, lost))
+    try:
+        while not lost.is_set():
+            async with BackgroundSessionLocal() as session:
+                run = await claim_next_run(session, job_name, WORKER_ID)
+            if run is None:
+                break
+
+            print(f"[worker] {job_name} run {run.id} ({run.run_key}) started")
+            t0 = time.monotonic()
+            stats, error = None, None
+            try:
+                stats = await _run_while_leased(job_name, lost)
+            except Exception:
+                error = traceback.format_exc()
+                print(f"[worker] {job_name} run {run.id} failed:\n{error}")
+            duration_ms = int((time.monotonic() - t0) * 1000)
+
+            async with BackgroundSessionLocal() as session:
+                recorded = await finish_run(session, run.id, duration_ms, stats, error, owner=WORKER_ID)
+            if recorded:
+                print(f"[worker] {job_name} run {run.id} finished in {duration_ms} ms: {stats}")
+            else:
+                print(f"[worker] {job_name} run {run.id} was taken over by another worker; result dropped")
+    finally:
+        stop.set()
+        await heartbeat
+        async with BackgroundSessionLocal() as session:
+            await release_lease(session, job_name, WORKER_ID)
+
+
+async def main():
+    await check_schema()
+
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        enqueue_daily_summary,
+        CronTrigger(hour=0, minute=5, timezone=timezone.utc),
+        id="daily_summary_job",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        enqueue_message_archive,
+        CronTrigger(hour=3, minute=30, timezone=timezone.utc),
+        id="message_archive_job",
+        replace_existing=True,
+    )
+    scheduler.start()
+
+    if SUMMARY_RESUME_ON_STARTUP:
+        await enqueue_daily_summary()
+    await enqueue_scheduled("seq_backfill", "migration-012")
+
+    print(f"[worker] {WORKER_ID} polling every {POLL_SECONDS}s for {', '.join(JOBS)}")
+    try:
+        while True:
+            for job_name in JOBS:
+                try:
+                    await run_pending(job_name)
+                except Exception as e:
+                    print(f"[worker] {job_name}: {e}")
+            await asyncio.sleep(POLL_SECONDS)
+    finally:
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from "react";
 import { getMailbox, getUserGroups,getTherapistUserProfile, sendMail,addUserToGroup,createAutoGroup,approveUser, markMailRead,getMailPartner } from "../api";
 import { useAuth } from "../AuthContext";
 import RejectModal from "../components/RejectModal";
+import useUserEvents from "../ws/useUserEvents";
 const Mailbox = () => {
   const { token, role } = useAuth();
   const [items, setItems] = useState([]);
@@ -92,6 +93,9 @@ const Mailbox = () => {
     }
   }, []);
 
+  // new mail (alert, direct message, approval) shows up without a refresh
+  useUserEvents(() => load());
+
   const toggle = async (id, is_read) => {
     const nowOpen = !open[id];
     setOpen((prev) => ({ ...prev, [id]: nowOpen }));
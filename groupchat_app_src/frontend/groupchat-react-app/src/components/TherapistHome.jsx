@@ -2,6 +2,7 @@ import React, { useEffect, useState } from "react";
 import { getMailbox } from "../api";
 import { useAuth } from "../AuthContext";
 import { useNavigate } from "react-router-dom";
+import useUserEvents from "../ws/useUserEvents";
 
 const TherapistHome = () => {
   const { token} = useAuth();
@@ -21,6 +22,9 @@ const TherapistHome = () => {
     load();
   }, []);
 
+  // keep the unread count live (safety alerts land in the mailbox)
+  useUserEvents(() => load());
+
   const unreadCount = messages.filter((m) => !m.is_read).length;
 
   return (
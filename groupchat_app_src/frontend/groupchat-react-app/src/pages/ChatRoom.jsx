@@ -1,6 +1,14 @@
 import React, { useState, useEffect, useRef } from "react";
 import { useAuth } from "../AuthContext";
 import { useNavigate, useParams } from "react-router-dom";
+import {
+  connectSocket,
+  subscribeTopic,
+  onReply,
+  sendFrame,
+  setCursor,
+  isSocketOpen,
+} from "../ws";
 
 const HARMFUL_KEYWORDS = [
   // self-harm
@@ -45,7 +53,11 @@ const ChatRoom = () => {
   const [myUsername, setMyUsername] = useState(""); // 当前登录用户的 username
 
   const bottomRef = useRef(null);
-  const wsRef = useRef(null);
+  const listRef = useRef(null);
+  const [olderCursor, setOlderCursor] = useState(null); // before_id for the next older page
+  const loadingOlderRef = useRef(false);
+  const keepScrollRef = useRef(false);
+  const pendingRef = useRef({}); // client_msg_id -> { resolve, reject }
   const [isSummarizing, setIsSummarizing] = useState(false);
 
   const [showWarning, setShowWarning] = useState(false);
@@ -72,6 +84,11 @@ const ChatRoom = () => {
 
   // 滚动到底部
   useEffect(() => {
+    // prepending older history must not jump to the bottom
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
     bottomRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages]);
 
@@ -80,14 +97,10 @@ const ChatRoom = () => {
     if (!groupId) return;
     loadMessages(groupId);
     loadGroupInfo(groupId);
-    connectWS(groupId);
+    const unsubscribe = connectWS(groupId);
 
-    // 组件卸载时关闭 ws
-    return () => {
-      if (wsRef.current) {
-        wsRef.current.close();
-      }
-    };
+    // 组件卸载时取消订阅（socket 本身是共享的）
+    return unsubscribe;
   }, [groupId]);
 
   // 根据成员列表 + userId 推断当前用户的 username
@@ -109,6 +122,42 @@ const ChatRoom = () => {
     );
 
     setMessages(visibleMessages);
+    setOlderCursor(data.next_cursor ?? null);
+    // resume from the group's publish seq, not the last id: a message held by
+    // moderation is published after messages with higher ids
+    if (data.last_seq) {
+      setCursor(Number(gid), data.last_seq);
+    }
+  };
+
+  // infinite scroll: fetch the page before the oldest message we have
+  const loadOlder = async () => {
+    if (!olderCursor || loadingOlderRef.current) return;
+    loadingOlderRef.current = true;
+
+    const list = listRef.current;
+    const prevHeight = list ? list.scrollHeight : 0;
+    try {
+      const res = await fetch(
+        `/api/messages?group_id=${groupId}&limit=50&before_id=${olderCursor}`,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      const data = await res.json();
+      const older = data.messages || [];
+
+      keepScrollRef.current = true;
+      setMessages((prev) => {
+        const seen = new Set(prev.map((m) => m.id));
+        return [...older.filter((m) => !seen.has(m.id)), ...prev];
+      });
+      setOlderCursor(data.next_cursor ?? null);
+
+      requestAnimationFrame(() => {
+        if (list) list.scrollTop = list.scrollHeight - prevHeight;
+      });
+    } finally {
+      loadingOlderRef.current = false;
+    }
   };
 
   const loadGroupInfo = async (gid) => {
@@ -131,33 +180,88 @@ const ChatRoom = () => {
     }
   };
 
+  // flagged message: warn the poster and offer the AI support opening line
+  const showVerdict = (result) => {
+    setWarningType(result.detail);
+    setAiOpeningLine(result.ai_opening_line || "");
+    setShowWarning(true);
+  };
+
+  const removeMessage = (messageId) =>
+    setMessages((prev) => prev.filter((m) => m.id !== messageId));
+
   // websocket 
   const connectWS = (gid) => {
-    if (wsRef.current) wsRef.current.close();
+    connectSocket(token);
+
+    const offReply = onReply((pkg) => {
+      if (pkg.type === "closed") {
+        // anything still waiting will be resent over HTTP with the same client_msg_id
+        Object.values(pendingRef.current).forEach((p) => p.reject({ retry: true }));
+        pendingRef.current = {};
+        return;
+      }
 
-    const ws = new WebSocket(`ws://localhost:8000/api/ws?token=${token}`);
-    wsRef.current = ws;
+      // replies to our own send_message commands
+      if ((pkg.type === "ack" || pkg.type === "error") && pkg.client_msg_id) {
+        const pending = pendingRef.current[pkg.client_msg_id];
+        if (pending) {
+          delete pendingRef.current[pkg.client_msg_id];
+          if (pkg.type === "ack") pending.resolve(pkg.result);
+          else pending.reject(pkg);
+        }
+      }
+    });
 
-    ws.onmessage = (event) => {
-      const pkg = JSON.parse(event.data);
+    const offGroup = subscribeTopic(`group:${Number(gid)}`, (pkg) => {
+      if (pkg.type === "resync") {
+        loadMessages(gid);
+        return;
+      }
+      // MODERATION_MODE=async: a message shown during the hold was flagged after all
+      if (pkg.type === "message_hidden") {
+        removeMessage(pkg.message_id);
+        return;
+      }
+      // MODERATION_MODE=async: the verdict on our own message, long after the ack
+      if (pkg.type === "moderation") {
+        if (pkg.result && pkg.result.ok === false) {
+          removeMessage(pkg.result.id);
+          showVerdict(pkg.result);
+        }
+        return;
+      }
       if (pkg.type !== "message") return;
       const msg = pkg.message;
+      // replayed frames may overlap what the HTTP load already returned
+      setMessages((prev) =>
+        prev.some((m) => m.id === msg.id) ? prev : [...prev, msg]
+      );
+      sendFrame({ type: "ack", group_id: msg.group_id, message_id: msg.id, seq: pkg.seq });
+    });
 
-      if (msg.group_id === Number(gid)) {
-        setMessages((prev) => [...prev, msg]);
-      }
+    return () => {
+      offGroup();
+      offReply();
     };
   };
 
-  const sendMessage = async () => {
-    const trimmed = input.trim();
-    if (!trimmed) return;
-    if (trimmed.toLowerCase().startsWith("@wemindbot summary")) {
-      await handleSummarize(trimmed);
-      setInput("");   
-      return;
-    }
+  const sendOverSocket = (clientMsgId, content) =>
+    new Promise((resolve, reject) => {
+      if (!isSocketOpen()) {
+        reject({ retry: true });
+        return;
+      }
+      pendingRef.current[clientMsgId] = { resolve, reject };
+      sendFrame({
+        type: "send_message",
+        client_msg_id: clientMsgId,
+        group_id: Number(groupId),
+        content,
+      });
+    });
 
+  const sendOverHttp = async (clientMsgId, content) => {
     const res = await fetch("/api/messages", {
       method: "POST",
       headers: {
@@ -166,17 +270,40 @@ const ChatRoom = () => {
       },
       body: JSON.stringify({
         group_id: Number(groupId),
-        content: input,
+        content,
+        client_msg_id: clientMsgId,
       }),
     });
+    return res.json();
+  };
 
-    const data = await res.json();
+  const sendMessage = async () => {
+    const trimmed = input.trim();
+    if (!trimmed) return;
+    if (trimmed.toLowerCase().startsWith("@wemindbot summary")) {
+      await handleSummarize(trimmed);
+      setInput("");   
+      return;
+    }
+
+    const clientMsgId = `${numericUserId}-${Date.now()}-${Math.random()
+      .toString(36)
+      .slice(2, 8)}`;
+
+    let data;
+    try {
+      data = await sendOverSocket(clientMsgId, input);
+    } catch (err) {
+      if (!err || !err.retry) {
+        console.error("Send failed:", err);
+        return;
+      }
+      data = await sendOverHttp(clientMsgId, input);
+    }
 
     // dangerous message detection
     if (data.ok === false) {
-      setWarningType(data.detail);
-      setAiOpeningLine(data.ai_opening_line || "");
-      setShowWarning(true);
+      showVerdict(data);
       return;
     }
 
@@ -323,7 +450,13 @@ const ChatRoom = () => {
       </div>
       <div className="chat-msg-wrapper">
       {/* Message List */}
-        <div className="chat-msg-list">
+        <div
+          className="chat-msg-list"
+          ref={listRef}
+          onScroll={(e) => {
+            if (e.currentTarget.scrollTop < 40) loadOlder();
+          }}
+        >
           {messages.map((m) => {
             // user_id first
             const isMeById =
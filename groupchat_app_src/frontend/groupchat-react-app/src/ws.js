@@ -1,40 +1,100 @@
-import { useEffect, useRef } from 'react';
-
-const useWebSocket = (token, onMessage) => {
-  const ws = useRef(null);
-
-  useEffect(() => {
-    if (!token) return;
-
-    const connectWS = () => {
-      const proto = window.location.protocol === 'https:' ? 'wss' : 'ws';
-      const gid = localStorage.getItem('group_id');
-      ws.current = new WebSocket(`${proto}://${window.location.host}/ws?token=${token}`);
-
-      ws.current.onmessage = (ev) => {
-        try {
-          const data = JSON.parse(ev.data);
-          if (data.type === 'message' && data.message.group_id === gid) {
-            onMessage(data.message);
-          }
-        } catch (e) {
-          console.error('Error parsing WebSocket message:', e);
-        }
-      };
-
-      ws.current.onclose = () => setTimeout(connectWS, 2000);
-    };
-
-    connectWS();
-
-    return () => {
-      if (ws.current) {
-        ws.current.close();
-      }
-    };
-  }, [token, onMessage]);
-
-  return ws;
+// One WebSocket per tab, shared by every component.
+// Components subscribe to server-side topics ("group:<id>", "mailbox", "therapist-chat");
+// the server only sends frames for topics somebody here is listening to.
+
+let socket = null;
+let socketToken = null;
+let reconnectTimer = null;
+
+const topicHandlers = new Map(); // topic -> Set(handler)
+const replyHandlers = new Set(); // direct replies (ack / error / subscribed)
+const cursors = {}; // group_id -> last seq seen, sent back on reconnect
+
+const socketUrl = (token) => `ws://localhost:8000/api/ws?token=${token}`;
+
+const rawSend = (frame) => {
+  if (!socket || socket.readyState !== WebSocket.OPEN) return false;
+  socket.send(JSON.stringify(frame));
+  return true;
+};
+
+const open = () => {
+  socket = new WebSocket(socketUrl(socketToken));
+
+  socket.onopen = () => {
+    const topics = [...topicHandlers.keys()];
+    // the server replays only what we missed while the socket was down
+    if (topics.length) rawSend({ type: "subscribe", topics, cursors });
+  };
+
+  socket.onmessage = (ev) => {
+    let data;
+    try {
+      data = JSON.parse(ev.data);
+    } catch (e) {
+      console.error("Error parsing WebSocket message:", e);
+      return;
+    }
+
+    if (data.seq && data.group_id) setCursor(data.group_id, data.seq);
+
+    if (!data.topic) {
+      replyHandlers.forEach((h) => h(data));
+      return;
+    }
+    (topicHandlers.get(data.topic) || []).forEach((h) => h(data));
+  };
+
+  socket.onclose = () => {
+    replyHandlers.forEach((h) => h({ type: "closed" }));
+    socket = null;
+    if (socketToken) reconnectTimer = setTimeout(open, 2000);
+  };
 };
 
-export default useWebSocket;
\ No newline at end of file
+export const connectSocket = (token) => {
+  if (!token || (socket && socketToken === token)) return;
+  disconnectSocket();
+  socketToken = token;
+  open();
+};
+
+export const disconnectSocket = () => {
+  socketToken = null;
+  clearTimeout(reconnectTimer);
+  if (socket) socket.close();
+  socket = null;
+};
+
+export const setCursor = (groupId, seq) => {
+  if (!cursors[groupId] || seq > cursors[groupId]) cursors[groupId] = seq;
+};
+
+export const sendFrame = (frame) => rawSend(frame);
+
+export const isSocketOpen = () =>
+  !!socket && socket.readyState === WebSocket.OPEN;
+
+// returns an unsubscribe function
+export const subscribeTopic = (topic, handler) => {
+  if (!topicHandlers.has(topic)) {
+    topicHandlers.set(topic, new Set());
+    rawSend({ type: "subscribe", topics: [topic], cursors });
+  }
+  topicHandlers.get(topic).add(handler);
+
+  return () => {
+    const handlers = topicHandlers.get(topic);
+    if (!handlers) return;
+    handlers.delete(handler);
+    if (!handlers.size) {
+      topicHandlers.delete(topic);
+      rawSend({ type: "unsubscribe", topics: [topic] });
+    }
+  };
+};
+
+export const onReply = (handler) => {
+  replyHandlers.add(handler);
+  return () => replyHandlers.delete(handler);
+};
@@ -0,0 +1,15 @@
+// Topic and frame names shared with the backend (backend/utils/ws_events.py);
+// backend/tests/test_ws_contract.py checks that the two stay in sync.
+
+export const MAILBOX_TOPIC = "mailbox";
+export const THERAPIST_CHAT_TOPIC = "therapist-chat";
+
+export const MAILBOX_EVENT = "mailbox";
+export const THERAPIST_CHAT_EVENT = "therapist_chat";
+
+// "kind" of a MAILBOX_EVENT frame
+export const MailboxKind = {
+  alert: "alert",
+  direct_message: "direct_message",
+  approval: "approval",
+};
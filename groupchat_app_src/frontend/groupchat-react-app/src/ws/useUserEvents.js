@@ -1,25 +1,26 @@
-import { useEffect } from "react";
-import { useNavigate } from "react-router-dom";
+import { useEffect, useRef } from "react";
 import { useAuth } from "../AuthContext";
+import { connectSocket, subscribeTopic } from "../ws";
+import { MAILBOX_TOPIC, MAILBOX_EVENT } from "./events";
 
-export default function useUserEvents() {
-  const { token, userId } = useAuth();
-  const navigate = useNavigate();
+// Calls onMailbox(frame) whenever a mailbox item arrives for this user
+// (frame.kind is one of MailboxKind), so the page can reload instead of
+// waiting for a manual refresh.
+export default function useUserEvents(onMailbox) {
+  const { token } = useAuth();
+  const handlerRef = useRef(onMailbox);
+  handlerRef.current = onMailbox;
 
   useEffect(() => {
     if (!token) return;
 
-    const ws = new WebSocket(`ws://localhost:8000/ws?token=${token}`);
+    // shares the tab's single socket instead of opening a second one
+    connectSocket(token);
 
-    ws.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-
-      // Approval event
-      if (data.type === "approved") {
-        navigate(`/chat/${data.group_id}`);
+    return subscribeTopic(MAILBOX_TOPIC, (data) => {
+      if (data.type === MAILBOX_EVENT && handlerRef.current) {
+        handlerRef.current(data);
       }
-    };
-
-    return () => ws.close();
+    });
   }, [token]);
 }
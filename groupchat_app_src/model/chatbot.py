@@ -1,4 +1,8 @@
 import json
+import re
+import time
+import asyncio
+import threading
 from typing import List, Dict, Any, Optional
 
 import numpy as np
@@ -7,7 +11,9 @@ import faiss
 from pydantic import BaseModel
 from transformers import (
     AutoTokenizer,
-    AutoModelForCausalLM
+    AutoModelForCausalLM,
+    StoppingCriteria,
+    StoppingCriteriaList
 )
 from sentence_transformers import SentenceTransformer
 import os, torch
@@ -19,6 +25,17 @@ RESOURCES_PATH = os.getenv("RESOURCES_PATH", "resources.json")
 
 TOP_K_RESOURCES = 3
 
+# per-user daily summaries: prompts per generate() call, and a cap on the
+# (one-sentence JSON) output so a batch doesn't run to the 1000-token default
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "8"))
+SUMMARY_MAX_NEW_TOKENS = int(os.getenv("SUMMARY_MAX_NEW_TOKENS", "256"))
+
+# map-reduce summaries: transcript tokens per prompt (well under the model context),
+# and the length of the intermediate note each chunk is condensed to
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+SUMMARY_NOTE_MAX_TOKENS = int(os.getenv("SUMMARY_NOTE_MAX_TOKENS", "160"))
+SUMMARY_MAX_REDUCE_ROUNDS = 4
+
 
 
 SAFETY_SYSTEM_PROMPT = """You are a supportive mental health support assistant for the MindMe app.
@@ -128,6 +145,15 @@ class ResourceRetriever:
 
 
 
+class CancelCriteria(StoppingCriteria):
+    """Stops generate() at the next token once the event is set (a superseded reply)."""
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
 class SupportLLM:
     def __init__(self, model_name: str):
         self.tokenizer = AutoTokenizer.from_pretrained(
@@ -157,6 +183,8 @@ class SupportLLM:
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
         self.model.config.pad_token_id = self.tokenizer.eos_token_id
+        # decoder-only batches must be padded on the left so generation continues the prompt
+        self.tokenizer.padding_side = "left"
 
         # Generation knobs (constants)
         self.max_new_tokens = 1000
@@ -164,6 +192,23 @@ class SupportLLM:
         self.top_p = 0.9
         self.repetition_penalty = 1.05
 
+        # token usage since start, for job telemetry (generate may run in threads)
+        self._usage_lock = threading.Lock()
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _count_usage(self, inputs, outputs):
+        prompt_len = inputs["input_ids"].shape[1]
+        prompt_tokens = int(inputs["attention_mask"].sum())
+        completion_tokens = int((outputs[:, prompt_len:] != self.tokenizer.pad_token_id).sum())
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["completion_tokens"] += completion_tokens
+
+    def usage_snapshot(self) -> dict:
+        with self._usage_lock:
+            return dict(self.usage)
+
     def _to_chat_messages(self, system_prompt, history, user_message):
         msgs = []
         if system_prompt:
@@ -177,7 +222,22 @@ class SupportLLM:
         msgs.append({"role": "user", "content": user_message})
         return msgs
 
-    def generate(self, system_prompt, history, user_message) -> str:
+    def _generation_kwargs(self, overrides: dict) -> dict:
+        """Per-call knob overrides; the instance defaults are never mutated."""
+        kwargs = dict(
+            max_new_tokens=overrides.get("max_new_tokens", self.max_new_tokens),
+            do_sample=True,
+            temperature=overrides.get("temperature", self.temperature),
+            top_p=overrides.get("top_p", self.top_p),
+            repetition_penalty=overrides.get("repetition_penalty", self.repetition_penalty),
+            pad_token_id=self.tokenizer.eos_token_id,
+        )
+        # cancel=threading.Event(): setting it from another thread ends the call early
+        if overrides.get("cancel") is not None:
+            kwargs["stopping_criteria"] = StoppingCriteriaList([CancelCriteria(overrides["cancel"])])
+        return kwargs
+
+    def generate(self, system_prompt, history, user_message, **overrides) -> str:
         messages = self._to_chat_messages(system_prompt, history, user_message)
         prompt = self.tokenizer.apply_chat_template(
             messages, tokenize=False, add_generation_prompt=True
@@ -186,20 +246,34 @@ class SupportLLM:
         inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
 
         with torch.no_grad():
-            outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=self.max_new_tokens,
-                do_sample=True,
-                temperature=self.temperature,
-                top_p=self.top_p,
-                repetition_penalty=self.repetition_penalty,
-                pad_token_id=self.tokenizer.eos_token_id,
-            )
+            outputs = self.model.generate(**inputs, **self._generation_kwargs(overrides))
+        self._count_usage(inputs, outputs)
         gen_ids = outputs[0]
         new_ids = gen_ids[inputs["input_ids"].shape[1]:] 
         text = self.tokenizer.decode(new_ids, skip_special_tokens=True).strip()
         return text.split(messages[-1]["content"])[-1].strip()
 
+    def generate_batch(self, system_prompt, user_messages: List[str], **overrides) -> List[str]:
+        """One padded generate() call for several independent single-turn prompts."""
+        if not user_messages:
+            return []
+        prompts = [
+            self.tokenizer.apply_chat_template(
+                self._to_chat_messages(system_prompt, [], m), tokenize=False, add_generation_prompt=True
+            )
+            for m in user_messages
+        ]
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+
+        with torch.no_grad():
+            outputs = self.model.generate(**inputs, **self._generation_kwargs(overrides))
+        self._count_usage(inputs, outputs)
+        prompt_len = inputs["input_ids"].shape[1]
+        return [
+            self.tokenizer.decode(out[prompt_len:], skip_special_tokens=True).strip()
+            for out in outputs
+        ]
+
 
 # =========================
 # INTENT + DIAGNOSIS-GUARD HELPERS
@@ -216,6 +290,90 @@ def is_resource_intent(message: str) -> bool:
     return any(kw in m for kw in RESOURCE_KEYWORDS)
 
 
+# Bot-reply gate for group messages. may_want_reply is the free prefilter on
+# the posting path; BotIntentGate then compares the message embedding with
+# a few prototype sentences per intent and answers only when a bot-directed
+# intent beats peer chatter by BOT_INTENT_MARGIN.
+BOT_INTENT_MARGIN = float(os.getenv("BOT_INTENT_MARGIN", "0.02"))
+
+BOT_INTENT_PROTOTYPES = {
+    "bot_question": [
+        "Can the bot explain this?",
+        "AI, what do you think I should do?",
+        "How do I stop overthinking at night?",
+        "What are some ways to calm down when I panic?",
+        "Why do I feel so tired all the time?",
+        "Is it normal to feel anxious before social events?",
+        "What can I do when I feel lonely?",
+        "How can I deal with stress at work?",
+    ],
+    "resource_request": [
+        "Is there a hotline I can call?",
+        "Can you share some resources about anxiety?",
+        "Where can I find a support group near me?",
+        "I need information about therapy options.",
+        "Any articles or apps that help with sleep?",
+        "Who can I talk to right now if things get bad?",
+    ],
+    "peer_chatter": [
+        "How was your weekend, Sam?",
+        "Did you all see the game last night?",
+        "lol right?",
+        "Isn't that funny?",
+        "Who else is joining the call later?",
+        "Thanks everyone, that really helped",
+        "Good morning all!",
+        "Me too, I know exactly how that feels",
+        "Jess, are you feeling better today?",
+        "Why would anyone do that, honestly?",
+    ],
+}
+BOT_INTENT_ANSWER = ("bot_question", "resource_request")
+
+_URL_RE = re.compile(r"(https?://|www\.)\S+", re.I)
+_BOT_MENTION_RE = re.compile(r"@?\b(bot|ai|wemind)\b", re.I)
+
+def strip_urls(message: str) -> str:
+    # a URL query string is not a question
+    return _URL_RE.sub(" ", message)
+
+def may_want_reply(message: str) -> bool:
+    m = strip_urls(message)
+    return "?" in m or is_resource_intent(m) or bool(_BOT_MENTION_RE.search(m))
+
+
+class BotIntentGate:
+    """Nearest-prototype intent classifier on an already loaded sentence embedder."""
+    def __init__(self, embedder: SentenceTransformer, prototypes: Dict[str, List[str]] = BOT_INTENT_PROTOTYPES):
+        self.embedder = embedder
+        self.labels = list(prototypes)
+        sentences, self._owner = [], []
+        for i, label in enumerate(self.labels):
+            sentences += prototypes[label]
+            self._owner += [i] * len(prototypes[label])
+        self.matrix = np.asarray(
+            embedder.encode(sentences, normalize_embeddings=True, show_progress_bar=False), dtype="float32"
+        )
+        self._owner = np.asarray(self._owner)
+
+    def classify(self, message: str) -> Dict[str, Any]:
+        """{"label", "scores", "margin", "answer", "latency_ms"}; one short encode, a few ms."""
+        t0 = time.perf_counter()
+        v = self.embedder.encode([strip_urls(message)], normalize_embeddings=True, show_progress_bar=False)[0]
+        sims = self.matrix @ np.asarray(v, dtype="float32")
+        # a label scores as its closest prototype
+        scores = {label: float(sims[self._owner == i].max()) for i, label in enumerate(self.labels)}
+        label = max(scores, key=scores.get)
+        margin = max(scores[name] for name in BOT_INTENT_ANSWER) - scores["peer_chatter"]
+        return {
+            "label": label,
+            "scores": {name: round(score, 4) for name, score in scores.items()},
+            "margin": round(margin, 4),
+            "answer": margin >= BOT_INTENT_MARGIN,
+            "latency_ms": round((time.perf_counter() - t0) * 1000, 2),
+        }
+
+
 def enforce_no_diagnosis(text: str) -> str:
     """
     Simple safety net: avoid hard diagnostic statements.
@@ -253,6 +411,198 @@ def attach_resources_to_reply(reply: str, resources: List[Dict[str, Any]]) -> st
     return "\n".join(lines)
 
 
+def _parse_json_object(raw: str) -> dict:
+    """Parse a JSON object out of model output robustly (no trimming of content)."""
+    obj = {}
+    try:
+        obj = json.loads(raw)
+    except Exception:
+        m = re.search(r"\{.*\}", raw, re.DOTALL)
+        if m:
+            try:
+                obj = json.loads(m.group(0))
+            except Exception:
+                obj = {}
+    return obj if isinstance(obj, dict) else {}
+
+
+# =========================
+# MAP-REDUCE SUMMARIZATION
+# =========================
+
+MAP_SYSTEM_PROMPT = (
+    "You condense part of a support-group chat for a facilitator. "
+    "Write 2-3 neutral sentences covering themes, concerns, coping strategies and tone, "
+    "keeping who said what when it matters. Do NOT diagnose. Plain text only."
+)
+
+
+class TokenChunker:
+    """
+    Packs lines, in order, into chunks of at most `budget` tokens. Only the open
+    chunk is held; a single line longer than the budget is split on token boundaries.
+    """
+    def __init__(self, tokenizer, budget: int = SUMMARY_CHUNK_TOKENS):
+        self.tokenizer = tokenizer
+        self.budget = budget
+        self._lines: list[str] = []
+        self._tokens = 0
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def add(self, line: str) -> list[str]:
+        """Add one line; returns the chunks this closed (usually none)."""
+        done = []
+        n = self.count(line)
+        if n > self.budget:
+            done += self.flush()
+            ids = self.tokenizer(line, add_special_tokens=False)["input_ids"]
+            for i in range(0, len(ids), self.budget):
+                done.append(self.tokenizer.decode(ids[i:i + self.budget]))
+            return done
+        if self._tokens + n > self.budget:
+            done += self.flush()
+        self._lines.append(line)
+        self._tokens += n + 1  # + newline
+        return done
+
+    def flush(self) -> list[str]:
+        if not self._lines:
+            return []
+        chunk = "\n".join(self._lines)
+        self._lines, self._tokens = [], 0
+        return [chunk]
+
+
+class MapReducer:
+    """Condenses chunk lists with batched generate() calls until each key fits in one prompt."""
+    def __init__(self, llm: "SupportLLM"):
+        self.llm = llm
+
+    def map(self, texts: list[str]) -> list[str]:
+        notes = []
+        for i in range(0, len(texts), SUMMARY_BATCH_SIZE):
+            notes += self.llm.generate_batch(
+                SAFETY_SYSTEM_PROMPT + "\n" + MAP_SYSTEM_PROMPT,
+                ["Chat excerpt:\n" + t + "\n\nCondensed notes:" for t in texts[i:i + SUMMARY_BATCH_SIZE]],
+                temperature=0.3, top_p=0.95, repetition_penalty=1.0,
+                max_new_tokens=SUMMARY_NOTE_MAX_TOKENS,
+            )
+        return notes
+
+    def reduce_to_fit(self, pieces_by_key: dict) -> dict:
+        """{key: [chunk, ...]} -> {key: text that fits one chunk}; all keys share each batch."""
+        for _ in range(SUMMARY_MAX_REDUCE_ROUNDS):
+            over = [(k, p) for k, ps in pieces_by_key.items() if len(ps) > 1 for p in ps]
+            if not over:
+                break
+            notes = self.map([p for _, p in over])
+            regrouped: dict = {k: ps for k, ps in pieces_by_key.items() if len(ps) <= 1}
+            chunkers = {}
+            for (k, _), note in zip(over, notes):
+                chunker = chunkers.setdefault(k, TokenChunker(self.llm.tokenizer))
+                regrouped.setdefault(k, []).extend(chunker.add(note))
+            for k, chunker in chunkers.items():
+                regrouped[k].extend(chunker.flush())
+            pieces_by_key = regrouped
+        # still too long after the last round (pathological): keep the most recent chunk
+        return {k: (ps[-1] if ps else "") for k, ps in pieces_by_key.items()}
+
+
+class GroupDaySummarizer:
+    """
+    Streaming per-user summaries for one group-day. Feed (user_id, message) in any
+    order; each user's messages are chunked by tokens and full chunks are condensed
+    in batches as they close, so memory is bounded by the chunk size (times active
+    users), not by how chatty the day was. Blocking: call from a worker thread.
+    """
+    def __init__(self, llm: "SupportLLM"):
+        self.llm = llm
+        self.reducer = MapReducer(llm)
+        self.chunkers: dict[str, TokenChunker] = {}
+        self.notes: dict[str, list[str]] = {}
+        self._pending: list[tuple[str, str]] = []
+
+    def add(self, user_id, message: str):
+        text = str(message or "").replace("\n", " ").strip()
+        if not text:
+            return
+        uid = str(user_id)
+        chunker = self.chunkers.setdefault(uid, TokenChunker(self.llm.tokenizer))
+        self.notes.setdefault(uid, [])
+        for chunk in chunker.add(text):
+            self._pending.append((uid, chunk))
+        if len(self._pending) >= SUMMARY_BATCH_SIZE:
+            self._map_pending()
+
+    def _map_pending(self):
+        if not self._pending:
+            return
+        notes = self.reducer.map([c for _, c in self._pending])
+        for (uid, _), note in zip(self._pending, notes):
+            self.notes[uid].append(note)
+        self._pending = []
+
+    def finish(self) -> dict[str, dict[str, str]]:
+        """{ user_id: { "summary": str, "mood": str } }"""
+        self._map_pending()
+
+        pieces, condensed = {}, {}
+        for uid, chunker in self.chunkers.items():
+            tail = chunker.flush()
+            condensed[uid] = bool(self.notes[uid])
+            rechunk = TokenChunker(self.llm.tokenizer)
+            ps = [c for note in self.notes[uid] for c in rechunk.add(note)]
+            ps += rechunk.flush() + tail
+            pieces[uid] = ps
+        texts = self.reducer.reduce_to_fit(pieces)
+
+        system = (
+            "You help a facilitator summarize a single participant's chat without diagnosing. "
+            "Provide: (1) a one-sentence summary (neutral, no medical diagnosis), and "
+            "(2) a SHORT mood/feeling/status phrase (free text, e.g., 'stressed and tired'). "
+            "Output STRICT JSON only for this user:\n"
+            "{\"summary\": \"...\", \"mood\": \"...\"}"
+        )
+
+        results: dict[str, dict[str, str]] = {}
+        todo = [(uid, t) for uid, t in texts.items() if t]
+        for uid, t in texts.items():
+            if not t:
+                results[uid] = {"summary": "", "mood": "neutral tone"}
+
+        for i in range(0, len(todo), SUMMARY_BATCH_SIZE):
+            batch = todo[i:i + SUMMARY_BATCH_SIZE]
+            prompts = [
+                ("Condensed notes on this user's messages (in order):\n" if condensed[uid]
+                 else "Messages from this user:\n")
+                + text +
+                "\n\nReturn ONLY the JSON object for this user. No extra text."
+                for uid, text in batch
+            ]
+            # lower temp for stable JSON per user
+            raws = self.llm.generate_batch(
+                SAFETY_SYSTEM_PROMPT + "\n" + system, prompts,
+                temperature=0.2, top_p=0.9, repetition_penalty=1.0,
+                max_new_tokens=SUMMARY_MAX_NEW_TOKENS,
+            )
+
+            for (uid, text), raw in zip(batch, raws):
+                obj = _parse_json_object(raw)
+                summary = str(obj.get("summary", "")).strip()
+                mood = str(obj.get("mood", "")).strip()
+
+                if not summary:
+                    # fallback: the (possibly condensed) text the model was given
+                    summary = text
+
+                summary = enforce_no_diagnosis(summary)  # keep safety language
+                results[uid] = {"summary": summary, "mood": (mood or "neutral tone")}
+
+        return results
+
+
 # =========================
 # MAIN CHATBOT WRAPPER
 # =========================
@@ -261,15 +611,16 @@ class MentalHealthChatbot:
     def __init__(self):
         self.retriever = ResourceRetriever(EMBED_MODEL_NAME, RESOURCES_PATH)
         self.llm = SupportLLM(LLM_MODEL_NAME)
+        self.intent_gate = BotIntentGate(self.retriever.embedder)
 
-    def handle_message(self, req: ChatRequest) -> ChatResponse:
+    def handle_message(self, req: ChatRequest, cancel: Optional[threading.Event] = None) -> ChatResponse:
         user_msg = req.message.strip()
         history = req.history or []
 
         #Resource-seeking?
         if is_resource_intent(user_msg):
             resources = self.retriever.retrieve(user_msg, top_k=TOP_K_RESOURCES)
-            base_reply = self.llm.generate(SAFETY_SYSTEM_PROMPT, history, user_msg)
+            base_reply = self.llm.generate(SAFETY_SYSTEM_PROMPT, history, user_msg, cancel=cancel)
             base_reply = enforce_no_diagnosis(base_reply)
             full_reply = attach_resources_to_reply(base_reply, resources)
             return ChatResponse(
@@ -279,7 +630,7 @@ class MentalHealthChatbot:
             )
 
         #Normal supportive conversation
-        base_reply = self.llm.generate(SAFETY_SYSTEM_PROMPT, history, user_msg)
+        base_reply = self.llm.generate(SAFETY_SYSTEM_PROMPT, history, user_msg, cancel=cancel)
         base_reply = enforce_no_diagnosis(base_reply)
         return ChatResponse(
             reply=base_reply,
@@ -341,172 +692,43 @@ class MentalHealthChatbot:
         return reply.strip()
 
     # ========= NEW: per-user summary + mood =========
+    def group_summarizer(self) -> GroupDaySummarizer:
+        """Streaming per-user summarizer for one group-day (see GroupDaySummarizer)."""
+        return GroupDaySummarizer(self.llm)
+
     async def summarize_group(self, messages_by_user: dict[str, any]) -> dict[str, dict[str, str]]:
-        
         """
-        Summarize each user's messages independently and return FULL summaries (no truncation).
+        Summarize each user's messages independently.
         messages_by_user: { user_id: "msg" | [msgs...] }
         Returns: { user_id: { "summary": str, "mood": str } }
+        Long days are map-reduced by token budget; runs in a worker thread.
         """
-
         if not messages_by_user:
             return {}
 
-        def _normalize_msgs(msgs) -> str:
-            if isinstance(msgs, list):
-                text = " ".join(str(m) for m in msgs if m)
-            else:
-                text = str(msgs or "")
-            return text.replace("\n", " ").strip()
-
-        results: dict[str, dict[str, str]] = {}
-
-        # lower temp for stable JSON per user
-        orig_temp, orig_top_p, orig_rep = self.llm.temperature, self.llm.top_p, self.llm.repetition_penalty
-        self.llm.temperature, self.llm.top_p, self.llm.repetition_penalty = 0.2, 0.9, 1.0
+        def _run():
+            summarizer = self.group_summarizer()
+            for uid, msgs in messages_by_user.items():
+                for m in (msgs if isinstance(msgs, list) else [msgs]):
+                    summarizer.add(uid, m)
+            results = summarizer.finish()
+            for uid in messages_by_user:
+                results.setdefault(str(uid), {"summary": "", "mood": "neutral tone"})
+            return results
 
-        for uid, msgs in messages_by_user.items():
-            user_text = _normalize_msgs(msgs)
-            if not user_text:
-                results[uid] = {"summary": "", "mood": "neutral tone"}
-                continue
+        return await asyncio.to_thread(_run)
 
-            system = (
-                "You help a facilitator summarize a single participant's chat without diagnosing. "
-                "Provide: (1) a one-sentence summary (neutral, no medical diagnosis), and "
-                "(2) a SHORT mood/feeling/status phrase (free text, e.g., 'stressed and tired'). "
-                "Output STRICT JSON only for this user:\n"
-                "{\"summary\": \"...\", \"mood\": \"...\"}"
-            )
-            user_prompt = (
-                "Messages from this user:\n"
-                + user_text +
-                "\n\nReturn ONLY the JSON object for this user. No extra text."
-            )
-
-            raw = self.llm.generate(SAFETY_SYSTEM_PROMPT + "\n" + system, history=[], user_message=user_prompt)
-
-            # Parse JSON robustly (no trimming of content)
-            import json, re
-            obj = {}
-            try:
-                obj = json.loads(raw)
-            except Exception:
-                m = re.search(r"\{.*\}", raw, re.DOTALL)
-                if m:
-                    try:
-                        obj = json.loads(m.group(0))
-                    except Exception:
-                        obj = {}
-
-            # Use model output as-is (full), with diagnosis guard on the summary only
-            if isinstance(obj, dict):
-                summary = str(obj.get("summary", "")).strip()
-                mood = str(obj.get("mood", "")).strip()
-            else:
-                summary, mood = "", ""
-
-            if not summary:
-                # fallback: use the user's own text fully (no truncation)
-                summary = user_text
-
-            summary = enforce_no_diagnosis(summary)  # keep safety language
-            results[uid] = {"summary": summary, "mood": (mood or "neutral tone")}
-
-        # restore generation knobs
-        self.llm.temperature, self.llm.top_p, self.llm.repetition_penalty = orig_temp, orig_top_p, orig_rep
-        return results
-    
-    async def summarize_chat(self, events: list[dict], sentences: int = 4, max_chars: int = 7000) -> str:
-        """
-        Summarize a whole group chat in a few sentences.
-        Input: events = [
-            {"user_id": "u123", "message": "text", "timestamp": "2025-12-01T12:30:00Z"},
-            ...
-        ]
-        - sentences: target number of sentences in the summary.
-        - max_chars: truncate transcript if the chat is huge (keeps recent messages preferentially).
-        Returns: plain-text summary (no diagnosis).
-        """
-        if not events:
-            return "No conversation to summarize."
-
-        # ---- normalize & sort by time ----
-        from datetime import datetime
-        def _parse_ts(ts):
-            if hasattr(ts, "isoformat"):  # datetime
-                return ts
-            # try several simple formats; fall back to raw string
-            for fmt in ("%Y-%m-%dT%H:%M:%S.%fZ",
-                        "%Y-%m-%dT%H:%M:%SZ",
-                        "%Y-%m-%d %H:%M:%S",
-                        "%Y-%m-%d"):
-                try:
-                    return datetime.strptime(str(ts), fmt)
-                except Exception:
-                    pass
-            return str(ts)
-
-        cleaned = []
-        for e in events:
-            uid = str(e.get("user_id", "")).strip() or "user"
-            msg = str(e.get("message", "")).replace("\n", " ").strip()
-            ts  = e.get("timestamp")
-            if not msg:
-                continue
-            cleaned.append(( _parse_ts(ts), uid, msg ))
-
-        # If timestamps are mixed strings/datetimes, stable-sort by str()
-        cleaned.sort(key=lambda x: (str(x[0])))
-
-        # ---- compact transcript (limit length, keep most recent if too long) ----
-        # Format: "2025-12-01 12:30  u123: message"
-        lines = []
-        for ts, uid, msg in cleaned:
-            ts_txt = ts.isoformat(timespec="minutes") if hasattr(ts, "isoformat") else str(ts)
-            lines.append(f"{ts_txt}  {uid}: {msg}")
-
-        # If too long, keep from the END (recent context is more useful)
-        transcript = "\n".join(lines)
-        if len(transcript) > max_chars:
-            # keep last max_chars worth (cut to line boundary)
-            cut = transcript[-max_chars:]
-            # ensure we start at a new line to avoid mid-line cut
-            transcript = cut[cut.find("\n")+1:] if "\n" in cut else cut
-
-        # ---- prompt the LLM ----
-        system = (
-            "You are helping a facilitator by summarizing a GROUP CHAT. "
-            "Write a concise, neutral summary in a few sentences. "
-            "Avoid any medical diagnosis; do not label disorders. "
-            "Touch on: main themes, notable concerns, coping strategies discussed, "
-            "and overall tone. Keep it factual and supportive."
-        )
-        user_prompt = (
-            f"Target length: about {max(2, int(sentences))} sentences.\n\n"
-            "Transcript (chronological):\n"
-            + transcript +
-            "\n\nWrite the summary as plain text (no bullets)."
-        )
-
-        # Use slightly lower temperature for stable summaries
-        orig_temp, orig_top_p, orig_rep = self.llm.temperature, self.llm.top_p, self.llm.repetition_penalty
-        self.llm.temperature, self.llm.top_p, self.llm.repetition_penalty = 0.3, 0.95, 1.0
-        summary = self.llm.generate(SAFETY_SYSTEM_PROMPT + "\n" + system, history=[], user_message=user_prompt).strip()
-        self.llm.temperature, self.llm.top_p, self.llm.repetition_penalty = orig_temp, orig_top_p, orig_rep
-
-        # Final safety pass: remove accidental diagnostic phrasing
-        summary = enforce_no_diagnosis(summary)
-        return summary
-    
-    async def summarize_chat(self, events: list[dict]) -> str:
+    async def summarize_chat(self, events: list[dict], previous_summary: str | None = None) -> str:
         """
-        Summarize a whole group chat in a concise paragraph (no sentence target, no truncation).
+        Summarize a whole group chat in a concise paragraph.
         Input events: [{"user_id": "...", "message": "...", "timestamp": "2025-12-01T12:30:00Z"}, ...]
-        Returns plain-text summary (no diagnosis).
+        previous_summary: rolling summary of everything before `events`; the new
+        messages are folded into it instead of re-summarizing the whole chat.
+        Transcripts over SUMMARY_CHUNK_TOKENS are map-reduced (chunk notes, then one
+        final pass) instead of being sent whole. Returns plain-text summary (no diagnosis).
         """
         if not events:
-            return "No conversation to summarize."
+            return previous_summary or "No conversation to summarize."
 
         from datetime import datetime
 
@@ -534,12 +756,17 @@ class MentalHealthChatbot:
             cleaned.append((_parse_ts(ts), uid, msg))
         cleaned.sort(key=lambda x: str(x[0]))
 
-        # build full transcript (no truncation)
         lines = []
         for ts, uid, msg in cleaned:
             ts_txt = ts.isoformat(timespec="minutes") if hasattr(ts, "isoformat") else str(ts)
             lines.append(f"{ts_txt}  {uid}: {msg}")
-        transcript = "\n".join(lines)
+
+        return await asyncio.to_thread(self._summarize_transcript, lines, previous_summary)
+
+    def _summarize_transcript(self, lines: list[str], previous_summary: str | None = None) -> str:
+        chunker = TokenChunker(self.llm.tokenizer)
+        chunks = [c for line in lines for c in chunker.add(line)] + chunker.flush()
+        transcript = MapReducer(self.llm).reduce_to_fit({"chat": chunks})["chat"]
 
         # prompt the LLM
         system = (
@@ -549,24 +776,30 @@ class MentalHealthChatbot:
             "Stay neutral and supportive. Do NOT provide medical diagnoses."
         )
         user_prompt = (
-            "Transcript (chronological):\n"
+            ("Condensed notes on the transcript (chronological):\n" if len(chunks) > 1
+             else "Transcript (chronological):\n")
             + transcript +
             "\n\nProduce a single concise paragraph (no bullets)."
         )
+        if previous_summary:
+            user_prompt = (
+                "Summary of the chat so far:\n" + previous_summary + "\n\n"
+                + ("Condensed notes on the new messages since then:\n" if len(chunks) > 1
+                   else "New messages since then (chronological):\n")
+                + transcript +
+                "\n\nUpdate the summary to include the new messages. "
+                "Produce a single concise paragraph (no bullets)."
+            )
 
         # lower temperature for stable summaries
-        orig_temp, orig_top_p, orig_rep = self.llm.temperature, self.llm.top_p, self.llm.repetition_penalty
-        self.llm.temperature, self.llm.top_p, self.llm.repetition_penalty = 0.3, 0.95, 1.0
-        summary = self.llm.generate(SAFETY_SYSTEM_PROMPT + "\n" + system, history=[], user_message=user_prompt).strip()
-        self.llm.temperature, self.llm.top_p, self.llm.repetition_penalty = orig_temp, orig_top_p, orig_rep
+        summary = self.llm.generate(
+            SAFETY_SYSTEM_PROMPT + "\n" + system, history=[], user_message=user_prompt,
+            temperature=0.3, top_p=0.95, repetition_penalty=1.0,
+        ).strip()
 
         return enforce_no_diagnosis(summary)
 
 
-
-
-
-
 if __name__ == "__main__":
     print("cuda?", torch.cuda.is_available())
     if torch.cuda.is_available():
@@ -8,10 +8,14 @@ Usage:
 """
 
 import os, json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.orm import sessionmaker
 from sentence_transformers import SentenceTransformer
 
@@ -31,6 +35,44 @@ def _l2(v: np.ndarray) -> np.ndarray:
     n = np.linalg.norm(v) + 1e-12
     return v / n
 
+def _decide(sims: List[Tuple[int, float, float]]) -> Dict[str, Any]:
+    """Gating rules on (group_id, sim, group avg_sim) candidates; sims must be non-empty."""
+    sims = sorted(sims, key=lambda x: x[1], reverse=True)
+    top5 = [(gid, round(sim, 4)) for gid, sim, _ in sims[:5]]
+
+    best_gid, best_sim, best_avg = sims[0]
+
+    if best_sim >= SIM_THRESHOLD and best_sim >= (best_avg - LENIENCY_GAMMA):
+        return {
+            "decision": "group",
+            "group_id": int(best_gid),
+            "score": float(best_sim),
+            "threshold": SIM_THRESHOLD,
+            "reason": "passes_threshold",
+            "top_candidates": top5
+        }
+    else:
+        return {
+            "decision": "new_group",
+            "group_id": None,
+            "score": float(best_sim),
+            "threshold": SIM_THRESHOLD,
+            "reason": "below_threshold" if best_sim < SIM_THRESHOLD else "undercuts_group_avg",
+            "top_candidates": top5
+        }
+
+CANDIDATES_SQL = """
+    SELECT g.id, COALESCE(gp.model, :m) AS model, gp.dim, gp.centroid,
+           gp.n_members, gp.avg_sim, g.max_size,
+           (SELECT COUNT(*) FROM chat_group_users cgu
+            WHERE cgu.group_id = g.id AND cgu.is_active=TRUE) AS cur_size
+    FROM chat_groups g
+    LEFT JOIN group_profiles gp ON gp.group_id = g.id
+    WHERE g.is_active = TRUE
+"""
+if MAX_GROUP_FILTER:
+    CANDIDATES_SQL += " AND COALESCE((SELECT COUNT(*) FROM chat_group_users cgu WHERE cgu.group_id = g.id AND cgu.is_active=TRUE), 0) < g.max_size"
+
 class GroupRecommender:
     SENSITIVE_QUESTIONS = {"Age Group", "Gender"}
     QUESTION_WEIGHTS = {
@@ -95,30 +137,8 @@ class GroupRecommender:
                 return {"decision":"no_groups_configured","group_id":None,"score":0.0,
                         "threshold":SIM_THRESHOLD,"reason":"no_group_centroids","top_candidates":[]}
 
-            sims.sort(key=lambda x: x[1], reverse=True)
-            top5 = [(gid, round(sim, 4)) for gid, sim, _ in sims[:5]]
-
-            best_gid, best_sim, best_avg = sims[0]
-
             # 4) gating rules (read-only recommendation)
-            if best_sim >= SIM_THRESHOLD and best_sim >= (best_avg - LENIENCY_GAMMA):
-                return {
-                    "decision": "group",
-                    "group_id": int(best_gid),
-                    "score": float(best_sim),
-                    "threshold": SIM_THRESHOLD,
-                    "reason": "passes_threshold",
-                    "top_candidates": top5
-                }
-            else:
-                return {
-                    "decision": "new_group",
-                    "group_id": None,
-                    "score": float(best_sim),
-                    "threshold": SIM_THRESHOLD,
-                    "reason": "below_threshold" if best_sim < SIM_THRESHOLD else "undercuts_group_avg",
-                    "top_candidates": top5
-                }
+            return _decide(sims)
 
     def _get_or_create_embedding(self, sess, user_id: int) -> Tuple[Optional[np.ndarray], Optional[int]]:
         """
@@ -183,7 +203,8 @@ class GroupRecommender:
         v = self.embedder.encode([text_blob], normalize_embeddings=True, show_progress_bar=False)[0].astype(np.float32)
         return v, int(v.shape[0])
 
-    def _render_questionnaire_text(self, q_json: dict) -> str:
+    @classmethod
+    def _render_questionnaire_text(cls, q_json: dict) -> str:
 
         # allow both shapes
         content = q_json.get("content", q_json) if isinstance(q_json, dict) else {}
@@ -214,7 +235,7 @@ class GroupRecommender:
             if not ans:
                 return
 
-            w = self.QUESTION_WEIGHTS.get(field, 1.0)
+            w = cls.QUESTION_WEIGHTS.get(field, 1.0)
             repeats = 2 if w >= 1.4 else 1
             line = f"{titles[field]}: {ans}"
             for _ in range(repeats):
@@ -238,18 +259,7 @@ class GroupRecommender:
         return str(ans)
 
     def _fetch_candidates(self, sess):
-        base_sql = """
-            SELECT g.id, COALESCE(gp.model, :m) AS model, gp.dim, gp.centroid,
-                   gp.n_members, gp.avg_sim, g.max_size,
-                   (SELECT COUNT(*) FROM chat_group_users cgu
-                    WHERE cgu.group_id = g.id AND cgu.is_active=TRUE) AS cur_size
-            FROM chat_groups g
-            LEFT JOIN group_profiles gp ON gp.group_id = g.id
-            WHERE g.is_active = TRUE
-        """
-        if MAX_GROUP_FILTER:
-            base_sql += " AND COALESCE((SELECT COUNT(*) FROM chat_group_users cgu WHERE cgu.group_id = g.id AND cgu.is_active=TRUE), 0) < g.max_size"
-        return sess.execute(text(base_sql), {"m": self.embed_model_name}).fetchall()
+        return sess.execute(text(CANDIDATES_SQL), {"m": self.embed_model_name}).fetchall()
 
 
 
@@ -476,12 +486,8 @@ class CentroidOps:
             """), {"g": group_id}).fetchall()
 
             if not rows:
-                # No active members → clear profile
-                sess.execute(text("""
-                    INSERT INTO group_profiles (group_id, model, dim, centroid, n_members, avg_sim)
-                    VALUES (:g, :m, 0, NULL, 0, 0.0)
-                    ON DUPLICATE KEY UPDATE model=:m, dim=VALUES(dim), centroid=NULL, n_members=0, avg_sim=0.0
-                """), {"g": group_id, "m": self.embed_model})
+                # No active members → drop the profile (centroid is NOT NULL, so it can't be blanked)
+                sess.execute(text("DELETE FROM group_profiles WHERE group_id=:g"), {"g": group_id})
                 return {"n_members": 0, "avg_sim": 0.0}
 
             # normalize each vector, then mean and renormalize
@@ -506,3 +512,201 @@ class CentroidOps:
                    "n": len(rows), "a": avg_sim})
 
             return {"n_members": len(rows), "avg_sim": avg_sim}
+
+
+
+# ========= ASYNC (backend) =========
+# The classes above open their own sync pymysql engine and load the embedding
+# model per instance. The backend uses these instead: they run on its
+# AsyncEngine (pass db.engine), share one loaded model per process, and do the
+# embedding / NumPy work in _grouping_pool so the event loop keeps serving.
+
+GROUPING_WORKERS = int(os.getenv("GROUPING_WORKERS", "1"))
+_grouping_pool = ThreadPoolExecutor(max_workers=GROUPING_WORKERS, thread_name_prefix="grouping")
+
+_embedders: Dict[str, SentenceTransformer] = {}
+_embedders_lock = threading.Lock()
+
+def get_embedder(name: str = EMBED_MODEL) -> SentenceTransformer:
+    # loading takes seconds, so it happens once, on a pool thread
+    with _embedders_lock:
+        if name not in _embedders:
+            _embedders[name] = SentenceTransformer(name)
+        return _embedders[name]
+
+async def _offload(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_grouping_pool, fn, *args)
+
+def _embed_text(model_name: str, text_blob: str) -> np.ndarray:
+    v = get_embedder(model_name).encode([text_blob], normalize_embeddings=True, show_progress_bar=False)[0]
+    return v.astype(np.float32)
+
+def _score_candidates(candidates: List[Tuple[int, bytes, int, float]], e: np.ndarray) -> List[Tuple[int, float, float]]:
+    return [(gid, float(np.dot(_from_blob(c, dim), e)), avg) for gid, c, dim, avg in candidates]
+
+def _incremental(c_old: np.ndarray, n_old: int, avg_old: float, e: np.ndarray) -> Tuple[np.ndarray, float]:
+    """New (centroid, avg_sim) after adding normalized e to a group of n_old."""
+    c_new = _l2((c_old * max(n_old, 1) + e) / (max(n_old, 1) + 1))
+    sim_new = float(np.dot(c_new, e))
+    return c_new, ((avg_old * n_old) + sim_new) / (n_old + 1)
+
+def _full_centroid(blobs: List[Tuple[bytes, int]], group_id: int) -> Tuple[np.ndarray, float]:
+    dim = int(blobs[0][1])
+    if any(int(d) != dim for _, d in blobs):
+        raise RuntimeError(f"Mixed embedding dimensions in group {group_id}")
+    mat = np.vstack([_l2(_from_blob(b, dim)) for b, _ in blobs])
+    centroid = _l2(mat.mean(axis=0))
+    return centroid, float((mat @ centroid).astype(float).mean())
+
+_EMBEDDING_UPSERT = """
+    INSERT INTO user_questionnaire_embeddings (user_id, model, dim, vec)
+    VALUES (:u, :m, :d, :v)
+    ON DUPLICATE KEY UPDATE model=:m, dim=:d, vec=:v
+"""
+
+async def _cached_embedding(conn, user_id: int) -> Optional[np.ndarray]:
+    row = (await conn.execute(text(
+        "SELECT dim, vec FROM user_questionnaire_embeddings WHERE user_id=:u"
+    ), {"u": user_id})).fetchone()
+    return _l2(_from_blob(row.vec, int(row.dim))) if row else None
+
+async def _embed_user(conn, user_id: int, model_name: str) -> Optional[np.ndarray]:
+    """Embed the user's questionnaire and upsert it (caller commits); None without answers."""
+    row = (await conn.execute(text(
+        "SELECT answers FROM user_questionnaires WHERE user_id=:u"
+    ), {"u": user_id})).fetchone()
+    if not row:
+        return None
+    q = row.answers if isinstance(row.answers, dict) else json.loads(row.answers)
+    text_blob = GroupRecommender._render_questionnaire_text(q)
+    e = await _offload(_embed_text, model_name, text_blob)
+    await conn.execute(text(_EMBEDDING_UPSERT), {"u": user_id, "m": model_name, "d": int(e.shape[0]), "v": _to_blob(e)})
+    return e
+
+async def _add_to_centroid(conn, group_id: int, e: np.ndarray, model_name: str):
+    # row lock: two members joining at once would otherwise both start from the same c_old
+    row = (await conn.execute(text("""
+        SELECT dim, centroid, n_members, avg_sim
+        FROM group_profiles WHERE group_id=:g FOR UPDATE
+    """), {"g": group_id})).fetchone()
+
+    if not row or row.centroid is None:
+        await conn.execute(text("""
+            INSERT INTO group_profiles (group_id, model, dim, centroid, n_members, avg_sim)
+            VALUES (:g, :m, :d, :c, 1, 1.0)
+            ON DUPLICATE KEY UPDATE model=:m, dim=:d, centroid=:c, n_members=1, avg_sim=1.0
+        """), {"g": group_id, "m": model_name, "d": int(e.shape[0]), "c": _to_blob(e)})
+        return
+
+    # one dim-sized vector: cheaper inline than a hop to the pool
+    dim = int(row.dim)
+    n_old = int(row.n_members or 0)
+    c_new, avg_new = _incremental(_from_blob(row.centroid, dim), n_old, float(row.avg_sim or 0.0), e)
+    await conn.execute(text("""
+        UPDATE group_profiles
+        SET centroid=:c, n_members=:n, dim=:d, model=:m, avg_sim=:a
+        WHERE group_id=:g
+    """), {"c": _to_blob(c_new), "n": n_old + 1, "d": dim, "m": model_name, "a": avg_new, "g": group_id})
+
+
+class AsyncGroupRecommender:
+    """GroupRecommender on an AsyncEngine; same result dict."""
+    def __init__(self, engine: AsyncEngine, embed_model: str = EMBED_MODEL):
+        self.engine = engine
+        self.embed_model_name = embed_model
+
+    async def recommend(self, user_id: int) -> Dict[str, Any]:
+        async with self.engine.connect() as conn:
+            e = await _cached_embedding(conn, user_id)
+            if e is None:
+                e = await _embed_user(conn, user_id, self.embed_model_name)
+                if e is None:
+                    return {"decision":"no_groups_configured","group_id":None,"score":0.0,
+                            "threshold":SIM_THRESHOLD,"reason":"no_questionnaire","top_candidates":[]}
+                await conn.commit()
+
+            candidates = (await conn.execute(text(CANDIDATES_SQL), {"m": self.embed_model_name})).fetchall()
+
+        if not candidates:
+            return {"decision":"new_group","group_id":None,"score":0.0,
+                    "threshold":SIM_THRESHOLD,"reason":"no_active_groups","top_candidates":[]}
+
+        sims = await _offload(_score_candidates, [
+            (row.id, row.centroid, int(row.dim), float(row.avg_sim))
+            for row in candidates if row.centroid is not None
+        ], e)
+        if not sims:
+            return {"decision":"no_groups_configured","group_id":None,"score":0.0,
+                    "threshold":SIM_THRESHOLD,"reason":"no_group_centroids","top_candidates":[]}
+        return _decide(sims)
+
+
+class AsyncGroupWriter:
+    """GroupWriter on an AsyncEngine (MySQL upserts)."""
+    def __init__(self, engine: AsyncEngine, embed_model: str = EMBED_MODEL):
+        self.engine = engine
+        self.embed_model = embed_model
+
+    async def apply_decision(self, user_id: int, decision: Dict[str, Any]) -> Dict[str, Any]:
+        async with self.engine.begin() as conn:
+            e = await _cached_embedding(conn, user_id)
+            if e is None:
+                e = await _embed_user(conn, user_id, self.embed_model)
+                if e is None:
+                    raise RuntimeError("No questionnaire answers for user")
+
+            dec = decision.get("decision")
+            if dec == "group" and decision.get("group_id"):
+                gid = int(decision["group_id"])
+            elif dec == "new_group":
+                gid = int((await conn.execute(text("INSERT INTO chat_groups (is_active) VALUES (TRUE)"))).lastrowid)
+            else:
+                raise ValueError(f"Unsupported decision payload: {decision}")
+
+            await conn.execute(text("UPDATE chat_groups SET is_active=TRUE WHERE id=:g"), {"g": gid})
+            await conn.execute(text("""
+                INSERT INTO chat_group_users (group_id, user_id, is_active)
+                VALUES (:g, :u, TRUE)
+                ON DUPLICATE KEY UPDATE is_active=TRUE
+            """), {"g": gid, "u": user_id})
+            await _add_to_centroid(conn, gid, e, self.embed_model)
+
+        return {"ok": True, "group_id": gid}
+
+
+class AsyncCentroidOps:
+    """CentroidOps on an AsyncEngine."""
+    def __init__(self, engine: AsyncEngine, embed_model: str = EMBED_MODEL):
+        self.engine = engine
+        self.embed_model = embed_model
+
+    async def update_centroid_incremental(self, group_id: int, user_id: int) -> None:
+        async with self.engine.begin() as conn:
+            e = await _cached_embedding(conn, user_id)
+            if e is None:
+                raise RuntimeError(f"No cached embedding for user {user_id}")
+            await _add_to_centroid(conn, group_id, e, self.embed_model)
+
+    async def rebuild_centroid_full(self, group_id: int) -> dict:
+        async with self.engine.begin() as conn:
+            rows = (await conn.execute(text("""
+                SELECT uqe.dim, uqe.vec
+                FROM chat_group_users cgu
+                JOIN user_questionnaire_embeddings uqe ON uqe.user_id = cgu.user_id
+                WHERE cgu.group_id=:g AND cgu.is_active=TRUE
+            """), {"g": group_id})).fetchall()
+
+            if not rows:
+                # no members, no profile: the next member to join starts a fresh one
+                await conn.execute(text("DELETE FROM group_profiles WHERE group_id=:g"), {"g": group_id})
+                return {"n_members": 0, "avg_sim": 0.0}
+
+            centroid, avg_sim = await _offload(_full_centroid, [(r.vec, r.dim) for r in rows], group_id)
+            await conn.execute(text("""
+                INSERT INTO group_profiles (group_id, model, dim, centroid, n_members, avg_sim)
+                VALUES (:g, :m, :d, :c, :n, :a)
+                ON DUPLICATE KEY UPDATE model=:m, dim=:d, centroid=:c, n_members=:n, avg_sim=:a
+            """), {"g": group_id, "m": self.embed_model, "d": int(centroid.shape[0]), "c": _to_blob(centroid),
+                   "n": len(rows), "a": avg_sim})
+
+        return {"n_members": len(rows), "avg_sim": avg_sim}
@@ -1,106 +0,0 @@
--- Create database/user (same as your file)
-CREATE DATABASE IF NOT EXISTS groupchat CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-CREATE USER IF NOT EXISTS 'chatuser'@'localhost' IDENTIFIED BY 'chatpass';
-GRANT ALL PRIVILEGES ON groupchat.* TO 'chatuser'@'localhost';
-FLUSH PRIVILEGES;
-USE groupchat;
-
--- =============== Core tables (from your schema) ===============
-
-CREATE TABLE IF NOT EXISTS users (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    username VARCHAR(50) NOT NULL UNIQUE,
-    user_role ENUM('user', 'therapist', 'operator') NOT NULL DEFAULT 'user',
-    prefer_name VARCHAR(50),
-    avatar_url VARCHAR(255) DEFAULT NULL,
-    basic_info TEXT,
-    password_hash VARCHAR(255) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
-CREATE TABLE IF NOT EXISTS chat_groups (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    group_name VARCHAR(50),
-    is_ai_1on1 BOOLEAN NOT NULL DEFAULT FALSE,
-    is_active BOOLEAN DEFAULT FALSE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    -- NEW: group capacity for assignment-on-arrival
-    max_size INT NOT NULL DEFAULT 8
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
-CREATE TABLE IF NOT EXISTS chat_group_users (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    group_id INT NOT NULL,
-    user_id INT NOT NULL,
-    is_active BOOLEAN DEFAULT FALSE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (group_id) REFERENCES chat_groups(id) ON DELETE CASCADE,
-    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-    UNIQUE KEY uk_group_user (group_id, user_id)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
-CREATE TABLE IF NOT EXISTS messages (
-  id INT AUTO_INCREMENT PRIMARY KEY,
-  user_id INT NULL,
-  group_id INT NOT NULL,
-  content TEXT NOT NULL,
-  is_bot BOOLEAN DEFAULT FALSE,
-  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-  CONSTRAINT fk_user  FOREIGN KEY (user_id)  REFERENCES users(id)       ON DELETE SET NULL,
-  CONSTRAINT fk_group FOREIGN KEY (group_id) REFERENCES chat_groups(id) ON DELETE CASCADE
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
-CREATE TABLE IF NOT EXISTS questionnaires (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    content JSON NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
-CREATE TABLE IF NOT EXISTS therapist_profiles (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    user_id INT NOT NULL UNIQUE,
-    bio TEXT,
-    expertise VARCHAR(255),
-    years_experience INT,
-    license_number VARCHAR(100),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    CONSTRAINT fk_therapist_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
-CREATE TABLE IF NOT EXISTS user_questionnaires (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    user_id INT NOT NULL UNIQUE,
-    answers JSON NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    CONSTRAINT fk_questionnaire_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
-
-
--- Per-user questionnaire embedding (L2-normalized float32 vector stored as bytes)
-CREATE TABLE IF NOT EXISTS user_questionnaire_embeddings (
-  user_id INT PRIMARY KEY,
-  model VARCHAR(128) NOT NULL,
-  dim INT NOT NULL,
-  vec LONGBLOB NOT NULL,
-  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-  CONSTRAINT fk_uqe_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
--- Per-group centroid + simple stats for fast nearest-centroid routing
-CREATE TABLE IF NOT EXISTS group_profiles (
-  group_id INT PRIMARY KEY,
-  model VARCHAR(128) NOT NULL,
-  dim INT NOT NULL,
-  centroid LONGBLOB NOT NULL,   -- float32 bytes, keep vectors L2-normalized
-  n_members INT NOT NULL,
-  avg_sim FLOAT NOT NULL,       -- running mean cosine-to-centroid
-  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-  CONSTRAINT fk_gp_group FOREIGN KEY (group_id) REFERENCES chat_groups(id) ON DELETE CASCADE
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
--- Helpful index to scan active, recent groups (optional)
-CREATE INDEX IF NOT EXISTS idx_active_created ON chat_groups (is_active, created_at);
\ No newline at end of file
@@ -0,0 +1,25 @@
+-- Composite / covering indexes for the hot query shapes.
+-- Built online (InnoDB in-place, no table lock), safe to run while the chat is up.
+
+-- history pages, replay, recent context for the judge / bot:
+--   WHERE group_id = ? AND is_visible = 1 [AND id < ?] ORDER BY id DESC LIMIT n
+-- daily summary job:
+--   WHERE group_id = ? AND is_bot = 0 AND created_at >= ? AND created_at < ?
+ALTER TABLE messages
+    ADD INDEX ix_messages_group_id_id (group_id, id),
+    ADD INDEX ix_messages_group_visible_id (group_id, is_visible, id),
+    ADD INDEX ix_messages_group_bot_created (group_id, is_bot, created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- therapist chat:   WHERE user_id = ? AND therapist_id = ? ORDER BY created_at
+-- unread counts:    COUNT(*) WHERE therapist_id = ? AND user_id = ? AND is_read = 0 AND sender_id = ?
+ALTER TABLE user_therapist_chats
+    ADD INDEX ix_utc_pair_created (user_id, therapist_id, created_at),
+    ADD INDEX ix_utc_unread (therapist_id, user_id, is_read, sender_id),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- inbox / sent box: WHERE to_user = ? (from_user = ?) ORDER BY created_at DESC
+ALTER TABLE mailbox_messages
+    ADD INDEX ix_mailbox_to_created (to_user, created_at),
+    ADD INDEX ix_mailbox_from_created (from_user, created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,31 @@
+-- Cold storage for old chat messages (hot/cold split).
+-- The archiver job moves rows older than MESSAGE_HOT_DAYS from messages /
+-- message_flag_logs into these tables in small batches, keeping their ids,
+-- so the hot table and its indexes stay sized to recent traffic.
+-- A split rather than PARTITION BY RANGE: InnoDB does not allow foreign keys
+-- on partitioned tables, and messages / message_flag_logs rely on them.
+
+CREATE TABLE IF NOT EXISTS messages_archive (
+  id INT PRIMARY KEY,
+  user_id INT NULL,
+  group_id INT NOT NULL,
+  content TEXT NOT NULL,
+  is_bot BOOLEAN DEFAULT FALSE,
+  is_visible TINYINT(1) NOT NULL DEFAULT 1,
+  created_at TIMESTAMP NULL,
+  KEY ix_messages_archive_group_visible_id (group_id, is_visible, id),
+  CONSTRAINT fk_archive_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+  CONSTRAINT fk_archive_group FOREIGN KEY (group_id) REFERENCES chat_groups(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS message_flag_logs_archive (
+    id INT PRIMARY KEY,
+    message_id INT NOT NULL,
+    level INT DEFAULT 1,
+    category VARCHAR(50),
+    rationale TEXT,
+    raw_response TEXT,
+    created_at TIMESTAMP NULL,
+    FOREIGN KEY (message_id) REFERENCES messages_archive(id) ON DELETE CASCADE,
+    UNIQUE KEY uk_message_log_archive (message_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
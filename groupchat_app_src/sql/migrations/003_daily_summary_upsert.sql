@@ -0,0 +1,24 @@
+-- Daily summary job: bulk upsert + resumable runs.
+
+-- the old select-then-insert could race and leave duplicates; keep the newest
+DELETE older FROM daily_user_summaries older
+JOIN daily_user_summaries newer
+  ON newer.group_id = older.group_id
+ AND newer.user_id = older.user_id
+ AND newer.summary_date = older.summary_date
+ AND newer.id > older.id;
+
+-- INSERT ... ON DUPLICATE KEY UPDATE target; also serves the therapist's
+-- WHERE group_id = ? AND user_id = ? AND summary_date BETWEEN ? AND ? lookup
+ALTER TABLE daily_user_summaries
+    ADD UNIQUE KEY uk_daily_summary (group_id, user_id, summary_date),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- groups already summarized for a given day
+CREATE TABLE IF NOT EXISTS summary_checkpoints (
+    summary_date DATE NOT NULL,
+    group_id INT NOT NULL,
+    finished_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (summary_date, group_id),
+    CONSTRAINT fk_sc_group FOREIGN KEY (group_id) REFERENCES chat_groups(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,34 @@
+-- Background jobs run by worker.py instead of inside the web process.
+
+-- one row per job name; whoever holds an unexpired lease is the only
+-- instance allowed to run that job
+CREATE TABLE IF NOT EXISTS job_leases (
+    job_name VARCHAR(64) PRIMARY KEY,
+    owner VARCHAR(128) NOT NULL,
+    lease_until DATETIME NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- queue + telemetry: the web tier / cron insert 'queued' rows, a worker runs them
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_name VARCHAR(64) NOT NULL,
+    run_key VARCHAR(128) NOT NULL,
+    status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+    requested_by INT NULL,
+    owner VARCHAR(128) NULL,
+    queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    duration_ms INT NULL,
+    groups_processed INT NULL,
+    llm_calls INT NULL,
+    prompt_tokens INT NULL,
+    completion_tokens INT NULL,
+    stats JSON NULL,
+    error TEXT NULL,
+    -- the same scheduled run enqueued by two workers collapses into one row
+    UNIQUE KEY uk_job_run (job_name, run_key),
+    KEY ix_job_runs_status (job_name, status, id),
+    CONSTRAINT fk_job_runs_user FOREIGN KEY (requested_by) REFERENCES users(id) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,10 @@
+-- Rolling summary per group for /api/support-chat/summary: the summary text
+-- (encrypted) and the last message id it covers, so a new request only folds
+-- in messages after that id.
+CREATE TABLE IF NOT EXISTS group_rolling_summaries (
+    group_id INT PRIMARY KEY,
+    last_message_id INT NOT NULL,
+    summary_text MEDIUMTEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    CONSTRAINT fk_grs_group FOREIGN KEY (group_id) REFERENCES chat_groups(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,11 @@
+-- Cursor for the key_rotation job: the last primary key re-encrypted per
+-- table under a given key version, so a stopped run resumes where it was.
+CREATE TABLE IF NOT EXISTS key_rotation_progress (
+    table_name VARCHAR(64) NOT NULL,
+    key_version INT NOT NULL,
+    last_id INT NOT NULL DEFAULT 0,
+    rows_rewritten INT NOT NULL DEFAULT 0,
+    finished_at DATETIME NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (table_name, key_version)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,19 @@
+-- Optional AES-GCM envelope format for message bodies (MESSAGE_ENCRYPTION=aesgcm).
+-- Sealed bodies live in content_enc (content is then ''); existing Fernet rows
+-- are untouched and still read from content.
+
+-- per-group data keys, wrapped by the master key
+CREATE TABLE IF NOT EXISTS group_data_keys (
+    group_id INT PRIMARY KEY,
+    wrapped_key VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_gdk_group FOREIGN KEY (group_id) REFERENCES chat_groups(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+ALTER TABLE messages
+    ADD COLUMN content_enc VARBINARY(8192) NULL AFTER content,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE messages_archive
+    ADD COLUMN content_enc VARBINARY(8192) NULL AFTER content,
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,7 @@
+-- Shared token buckets for the auth rate limits when RATE_LIMIT_STORE=db
+-- (utils/ratelimit.py); with the default in-memory store this stays empty.
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    bucket_key VARCHAR(191) PRIMARY KEY,
+    tokens DOUBLE NOT NULL,
+    updated_at DATETIME(6) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,13 @@
+-- MODERATION_MODE=async stores a message as 'pending' (hidden) and lets a
+-- moderation worker set the verdict; existing rows count as approved.
+ALTER TABLE messages
+    ADD COLUMN moderation_status ENUM('approved', 'pending', 'flagged') NOT NULL DEFAULT 'approved' AFTER is_bot,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE messages
+    ADD INDEX ix_messages_moderation_status (moderation_status, id),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE messages_archive
+    ADD COLUMN moderation_status ENUM('approved', 'pending', 'flagged') NOT NULL DEFAULT 'approved' AFTER is_bot,
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,19 @@
+-- Durable queue for request follow-up work (bot replies, safety alerts,
+-- centroid updates), claimed by every web process with SKIP LOCKED.
+CREATE TABLE IF NOT EXISTS background_tasks (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    task_type VARCHAR(64) NOT NULL,
+    payload JSON NULL,
+    priority INT NOT NULL DEFAULT 5,
+    status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    owner VARCHAR(128) NULL,
+    enqueued_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    run_after DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME NULL,
+    locked_until DATETIME NULL,
+    finished_at DATETIME NULL,
+    error TEXT NULL,
+    KEY ix_background_tasks_claim (task_type, status, priority, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,16 @@
+-- Decisions of the bot-reply intent gate (chat_routes._bot_intent_allows),
+-- kept to measure its precision. No FK: messages move to messages_archive.
+CREATE TABLE IF NOT EXISTS bot_intent_logs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    message_id INT NOT NULL,
+    group_id INT NOT NULL,
+    label VARCHAR(32) NOT NULL,
+    margin FLOAT NULL,
+    scores JSON NULL,
+    answered BOOLEAN NOT NULL,
+    mode VARCHAR(16) NOT NULL,
+    latency_ms FLOAT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY ix_bot_intent_logs_created (created_at),
+    KEY ix_bot_intent_logs_message (message_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,50 @@
+-- Per-group publish sequence. A message gets the next chat_groups.last_seq when
+-- it is broadcast, not when it is inserted: a message held by async moderation
+-- is published after messages with higher ids, and a client resuming from the
+-- last id it saw would skip it. Reconnect cursors and replay use seq instead.
+--
+-- Only DDL and per-group bookkeeping here. Existing visible rows get seq = id
+-- from the seq_backfill job (worker.py), in short PK-range batches, not from
+-- one full-table UPDATE.
+ALTER TABLE chat_groups
+    ADD COLUMN last_seq BIGINT NOT NULL DEFAULT 0,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE messages
+    ADD COLUMN seq BIGINT NULL AFTER group_id,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE messages_archive
+    ADD COLUMN seq BIGINT NULL AFTER group_id,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE messages
+    ADD INDEX ix_messages_group_seq (group_id, seq),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE messages_archive
+    ADD INDEX ix_messages_archive_group_seq (group_id, seq),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Cursor for the seq_backfill job, per table: rows up to upto_id get seq = id.
+-- upto_id is fixed here, before the counters below, so every backfilled seq is
+-- below its group's counter and never collides with a newly assigned one.
+CREATE TABLE IF NOT EXISTS seq_backfill_progress (
+    table_name VARCHAR(64) PRIMARY KEY,
+    upto_id INT NOT NULL,
+    last_id INT NOT NULL DEFAULT 0,
+    rows_updated INT NOT NULL DEFAULT 0,
+    finished_at DATETIME NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT IGNORE INTO seq_backfill_progress (table_name, upto_id)
+SELECT t.name, (SELECT COALESCE(MAX(id), 0) FROM messages)
+FROM (SELECT 'messages' AS name UNION ALL SELECT 'messages_archive') t;
+
+-- one row per group, each an index lookup on (group_id, id)
+UPDATE chat_groups g
+SET g.last_seq = GREATEST(
+    COALESCE((SELECT MAX(m.id) FROM messages m WHERE m.group_id = g.id), 0),
+    COALESCE((SELECT MAX(a.id) FROM messages_archive a WHERE a.group_id = g.id), 0)
+);
@@ -0,0 +1,7 @@
+-- The rolling summary's cursor becomes the group's publish seq (messages.seq)
+-- instead of a message id, so messages that become visible late (held by
+-- moderation, or posted while a summary was being generated) are still folded
+-- in. Existing values stay valid: the rows they covered get seq = id (see 012).
+ALTER TABLE group_rolling_summaries
+    RENAME COLUMN last_message_id TO last_seq,
+    ALGORITHM=INPLACE, LOCK=NONE;